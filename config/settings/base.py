@@ -124,6 +124,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "homebank.utils.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -274,3 +275,9 @@ SOCIALACCOUNT_ADAPTER = "homebank.users.adapters.SocialAccountAdapter"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Maximum amount of transactions a single save may categorize through similarity
+CATEGORY_PROPAGATION_LIMIT = env.int("CATEGORY_PROPAGATION_LIMIT", default=500)
+# Seconds after which a running import job is considered abandoned by its worker and is claimed again
+IMPORT_JOB_TIMEOUT = env.int("IMPORT_JOB_TIMEOUT", default=60 * 60)
+# Share of the requests of which the queries and timings are measured and logged, between 0 and 1
+REQUEST_METRICS_SAMPLE_RATE = env.float("REQUEST_METRICS_SAMPLE_RATE", default=0.1)
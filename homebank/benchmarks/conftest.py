@@ -0,0 +1,63 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from django.db import connection
+
+# BENCHMARK_SIZES=1000,10000,100000 adds the largest history, an import of 100k rows takes long while
+# every categorized row grows the index the next chunk is scored against
+BENCHMARK_SIZES = [int(size) for size in os.environ.get('BENCHMARK_SIZES', '1000,10000').split(',')]
+BENCHMARK_DIR = Path(__file__).resolve().parents[2] / '.benchmarks'
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class BenchmarkResults:
+    """Collects the measurements of a run, written as json so runs of different commits can be compared"""
+
+    def __init__(self):
+        self.commit = _git_commit()
+        self.started_at = datetime.now()
+        self.results = []
+
+    def add(self, name: str, size: int, **metrics):
+        self.results.append({'name': name, 'size': size, **metrics})
+        print(f'{name} [{size:,}]: ' + ', '.join(f'{key}={value}' for key, value in metrics.items()))
+
+    def write(self) -> Path:
+        path = Path(os.environ.get('BENCHMARK_OUTPUT') or
+                    BENCHMARK_DIR / f'{self.started_at:%Y%m%d-%H%M%S}-{self.commit}.json')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            'commit': self.commit,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'results': self.results,
+        }, indent=2))
+
+        return path
+
+
+@pytest.fixture(scope='session')
+def benchmark_results():
+    results = BenchmarkResults()
+    yield results
+
+    if results.results:
+        print(f'\nBenchmark results written to {results.write()}')
+
+
+@pytest.fixture(params=BENCHMARK_SIZES, ids=lambda size: f'{size}rows')
+def size(request) -> int:
+    return request.param
@@ -0,0 +1,120 @@
+import csv
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from typing import Iterator, List, Tuple
+
+RABOBANK_COLUMNS = [
+    'IBAN/BBAN', 'Munt', 'BIC', 'Volgnr', 'Datum', 'Rentedatum', 'Bedrag', 'Saldo na trn', 'Tegenrekening IBAN/BBAN',
+    'Naam tegenpartij', 'Naam uiteindelijke partij', 'Naam initiërende partij', 'BIC tegenpartij', 'Code', 'Batch ID',
+    'Transactiereferentie', 'Machtigingskenmerk', 'Incassant ID', 'Betalingskenmerk', 'Omschrijving-1',
+    'Omschrijving-2', 'Omschrijving-3', 'Reden retour', 'Oorspr bedrag', 'Oorspr munt', 'Koers'
+]
+ACCOUNT_NUMBER = 'NL11RABO0104955555'
+
+# (payee, memo template, lowest amount, highest amount, kind), a card payment memo gets the time of the
+# payment, a direct debit gets an incasso id, the rest of the memo is fixed per merchant
+MERCHANTS = [
+    ('Albert Heijn {branch} {city}', 'Betaalautomaat {time} pasnr. 008', 3, 120, 'card'),
+    ('Jumbo {city} {branch}', 'Betaalautomaat {time} pasnr. 008', 2, 90, 'card'),
+    ('Lidl {branch} {city}', 'Betaalautomaat {time} pasnr. 008', 4, 70, 'card'),
+    ('SPY*Parking {city}', 'Betaalautomaat {time} pasnr. 008', 1, 15, 'card'),
+    ('Shell {city}', 'Betaalautomaat {time} pasnr. 008', 20, 90, 'card'),
+    ('NS Groep IZ NS Reizigers', 'NS reizen {city}', 3, 40, 'card'),
+    ('Bol.com', 'Bestelling {reference}', 8, 250, 'card'),
+    ('Thuisbezorgd.nl via Adyen', 'Order {reference}', 12, 60, 'card'),
+    ('Spotify', 'Spotify abonnement', 10, 15, 'incasso'),
+    ('Ziggo Services BV', 'Factuur {reference}', 50, 80, 'incasso'),
+    ('Zilveren Kruis Zorgverzekeringen', 'Zorgverzekering premie', 110, 140, 'incasso'),
+    ('Gemeente {city}', 'Gemeentelijke belastingen', 30, 120, 'incasso'),
+    ('Woningstichting {city}', 'Huur {month}', 650, 950, 'transfer'),
+    ('J. Jansen', 'Terugbetaling {reference}', 5, 60, 'transfer'),
+]
+INCOME = [
+    ('Werkgever B.V.', 'Salaris {month}', 2400, 3800),
+    ('Belastingdienst', 'Teruggaaf {reference}', 50, 900),
+]
+CITIES = ['Amsterdam', 'Utrecht', 'Heerlen', 'Sittard', 'Maastricht', 'Eindhoven', 'Rotterdam', 'Den Haag']
+# how often a merchant occurs falls off like a Zipf distribution: the supermarket far more than the tax refund
+ZIPF_EXPONENT = 1.1
+
+
+class SyntheticRabobankExport:
+    """
+    Generates a Rabobank csv export with realistic payees and memos. Everything is derived from
+    the seed, so every run and every commit benchmarks the same file.
+
+    :param amount_of_rows: amount of transactions, without the header
+    :param start: date of the first transaction
+    :param rows_per_day: amount of transactions on a single day
+    :param seed: seed of the random generator
+    """
+
+    def __init__(self, amount_of_rows: int, start: date = date(2018, 1, 1), rows_per_day: int = 12, seed: int = 1):
+        self.amount_of_rows = amount_of_rows
+        self.start = start
+        self.rows_per_day = rows_per_day
+        self.seed = seed
+
+    def rows(self) -> Iterator[List[str]]:
+        generator = random.Random(self.seed)
+        weights = [1 / (rank ** ZIPF_EXPONENT) for rank in range(1, len(MERCHANTS) + 1)]
+        balance = Decimal('1500.00')
+
+        for index in range(self.amount_of_rows):
+            day = self.start + timedelta(days=index // self.rows_per_day)
+
+            if day.day == 25 and index % self.rows_per_day == 0:
+                payee, memo, amount, kind = self._income(generator, day)
+            else:
+                payee, memo, amount, kind = self._expense(generator, day, weights)
+
+            balance += amount
+            yield [
+                ACCOUNT_NUMBER, 'EUR', 'RABONL2U', f'{index + 1:018d}', day.isoformat(), day.isoformat(),
+                self._format_amount(amount), self._format_amount(balance), self._account_number(generator, kind),
+                payee, '', '', 'RABONL2U', 'bc' if kind == 'card' else 'ei', '', '', '',
+                f'NL{generator.randint(10, 99)}ZZZ{generator.randint(10 ** 11, 10 ** 12 - 1)}'
+                if kind == 'incasso' else '',
+                '', memo, ' ', '', '', '', '', ''
+            ]
+
+    def content(self) -> str:
+        stream = StringIO(newline='')
+        writer = csv.writer(stream, quoting=csv.QUOTE_ALL, lineterminator='\r\n')
+        writer.writerow(RABOBANK_COLUMNS)
+        writer.writerows(self.rows())
+
+        return stream.getvalue()
+
+    def stream(self) -> StringIO:
+        """:return: the export as the text stream an upload would give"""
+        return StringIO(self.content(), newline='')
+
+    def _expense(self, generator: random.Random, day: date, weights) -> Tuple[str, str, Decimal, str]:
+        payee, memo, lowest, highest, kind = generator.choices(MERCHANTS, weights)[0]
+        amount = Decimal(generator.randint(lowest * 100, highest * 100)) / 100
+
+        return self._fill(generator, payee, day), self._fill(generator, memo, day), -amount, kind
+
+    def _income(self, generator: random.Random, day: date) -> Tuple[str, str, Decimal, str]:
+        payee, memo, lowest, highest = generator.choices(INCOME, [20, 1])[0]
+        amount = Decimal(generator.randint(lowest * 100, highest * 100)) / 100
+
+        return payee, self._fill(generator, memo, day), amount, 'transfer'
+
+    def _fill(self, generator: random.Random, template: str, day: date) -> str:
+        return template.format(
+            branch=generator.randint(1000, 1010), city=generator.choice(CITIES),
+            time=f'{generator.randint(8, 21):02d}:{generator.randint(0, 59):02d}',
+            reference=generator.randint(10 ** 7, 10 ** 8 - 1), month=day.strftime('%m-%Y'))
+
+    def _account_number(self, generator: random.Random, kind: str) -> str:
+        if kind == 'card':
+            return ''
+
+        return f'NL{generator.randint(10, 99)}INGB000{generator.randint(10 ** 6, 10 ** 7 - 1)}'
+
+    def _format_amount(self, amount: Decimal) -> str:
+        return f'{amount:+.2f}'.replace('.', ',')
@@ -0,0 +1,212 @@
+"""
+Benchmarks of the import, the categorization, the month view and the export against the size of the history,
+and of the parsers, the trend view and the formatting of amounts.
+
+They are left out of the regular test run, run them with `pytest -m benchmark`. BENCHMARK_SIZES
+picks the amounts of rows and BENCHMARK_OUTPUT the json file the results are written to.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from unicodedata import normalize
+
+import pytest
+from babel.numbers import format_currency
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from homebank.benchmarks.synthetic import SyntheticRabobankExport
+from homebank.expenses.models import MonthlyCategoryTotal
+from homebank.expenses.snapshots import month_snapshots
+from homebank.expenses.views import TrendView
+from homebank.transaction_management.categorization import categorization_indexes
+from homebank.transaction_management.models import Category, Transaction
+from homebank.transaction_management.parsers import AbnAmroTabParser, IngCsvParser, RabobankCsvParser
+from homebank.transaction_management.tests.test_parsers import ABN_AMRO_ROW, ING_ROW, RABOBANK_ROW
+from homebank.transaction_management.utils import create_unique_code
+from homebank.utils.currency import CurrencyFormatter
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+HISTORY_START = date(2010, 1, 1)
+# the history the import is categorized with, a year of transactions
+IMPORT_HISTORY_SIZE = 4000
+SAMPLE_SIZE = 200
+
+
+def create_categorized_history(user, amount_of_rows: int, start: date = HISTORY_START):
+    """Stores a synthetic history of the user, every transaction is categorized by the first word of its payee"""
+    categories = {}
+    transactions = {}
+
+    for row in RabobankCsvParser().parse_chunk(list(SyntheticRabobankExport(amount_of_rows, start, seed=2).rows())):
+        name = row.payee.split()[0]
+        if name not in categories:
+            categories[name] = Category.objects.create(name=name)
+
+        transaction = Transaction(user=user, category=categories[name], **row._asdict())
+        transaction.code = create_unique_code(transaction)
+        transactions[transaction.code] = transaction
+
+    Transaction.objects.bulk_create(transactions.values(), batch_size=500)
+    MonthlyCategoryTotal.objects.rebuild(user)
+    categorization_indexes.drop(user.id)
+
+
+def timed(function, *args, **kwargs):
+    """:return: (seconds the call took, its result)"""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+
+    return time.perf_counter() - started, result
+
+
+@contextmanager
+def without_gc():
+    """Like timeit, keeps a collection of the garbage of the benchmarks before out of a timing"""
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def test_import_throughput(user, size, benchmark_results):
+    create_categorized_history(user, IMPORT_HISTORY_SIZE)
+    export = SyntheticRabobankExport(size, start=date(2020, 1, 1))
+
+    seconds, result = timed(Transaction.objects.create_from_file, export.stream(), user)
+
+    assert result.amount_successful + result.amount_duplicate == size
+    benchmark_results.add(
+        'import', size, seconds=round(seconds, 3), rows_per_second=round(size / seconds),
+        successful=result.amount_successful, duplicate=result.amount_duplicate,
+        categorized=Transaction.objects.filter(user=user, category__isnull=False, date__gte=date(2020, 1, 1)).count())
+
+
+@pytest.mark.parametrize('parser, row', [
+    (RabobankCsvParser(), RABOBANK_ROW),
+    (IngCsvParser(), ING_ROW),
+    (AbnAmroTabParser(), ABN_AMRO_ROW),
+], ids=lambda value: getattr(value, 'name', ''))
+def test_parser_throughput(parser, row, size, benchmark_results):
+    rows = [row] * size
+    # the first chunk fills the caches of the dates and the csv module, which an import pays once
+    parser.parse_chunk(rows[:100])
+
+    with without_gc():
+        seconds, parsed_rows = timed(parser.parse_chunk, rows)
+
+    assert None not in parsed_rows
+    assert size / seconds > 20000
+    benchmark_results.add(f'parse_{parser.name}', size, rows_per_second=round(size / seconds))
+
+
+def test_categorization_latency(user, size, benchmark_results):
+    create_categorized_history(user, size)
+    build_seconds, index = timed(categorization_indexes.get, user.id)
+
+    rows = RabobankCsvParser().parse_chunk(list(SyntheticRabobankExport(SAMPLE_SIZE, date(2030, 1, 1), seed=3).rows()))
+    transactions = [Transaction(user=user, **row._asdict()) for row in rows]
+
+    with without_gc():
+        latencies = []
+        for transaction in transactions:
+            seconds, _ = timed(transaction._try_assign_category, transaction)
+            latencies.append(seconds)
+
+        batch_seconds, _ = timed(index.match_many, [transaction.description for transaction in transactions],
+                                 Transaction.score_threshold)
+
+    # batching is only worth it when it is at least as fast per row as categorizing on save, both score
+    # a distinct description the same way, the margin absorbs the noise of the timings
+    assert batch_seconds / len(transactions) <= statistics.mean(latencies) * 1.1
+    benchmark_results.add(
+        'categorization', size, index_size=len(index), index_build_ms=milliseconds(build_seconds),
+        per_row_mean_ms=milliseconds(statistics.mean(latencies)),
+        per_row_p95_ms=milliseconds(sorted(latencies)[int(len(latencies) * 0.95)]),
+        batched_per_row_ms=milliseconds(batch_seconds / len(transactions)),
+        categorized=sum(transaction.category_id is not None for transaction in transactions))
+
+
+def test_month_view_latency(client, user, size, benchmark_results):
+    create_categorized_history(user, size)
+    last_date = Transaction.objects.filter(user=user).latest('date').date
+    month = date(last_date.year, last_date.month, 1)
+    url = f'/expenses/{month:%Y-%m}/'
+    client.force_login(user)
+
+    cold_latencies = []
+    for _ in range(5):
+        month_snapshots.invalidate_all()
+        seconds, response = timed(client.get, url)
+        assert response.status_code == 200
+        cold_latencies.append(seconds)
+
+    warm_latencies = [timed(client.get, url)[0] for _ in range(5)]
+
+    with CaptureQueriesContext(connection) as queries:
+        overview_seconds, _ = timed(Category.objects.overview_for_month, month, user)
+
+    benchmark_results.add(
+        'month_view', size, cold_ms=milliseconds(statistics.median(cold_latencies)),
+        warm_ms=milliseconds(statistics.median(warm_latencies)), overview_ms=milliseconds(overview_seconds),
+        overview_queries=len(queries))
+
+
+def test_trend_view_latency(rf, user, benchmark_results):
+    categories = [Category.objects.create(name=f'Category {number}') for number in range(30)]
+    MonthlyCategoryTotal.objects.bulk_create([
+        MonthlyCategoryTotal(user=user, category=category, month=date(2018 + month // 12, month % 12 + 1, 1),
+                             inflow=0, outflow=month + 1, count=1)
+        for category in categories for month in range(24)
+    ])
+    request = rf.get('/expenses/trend/', {'until': '2019-12', 'months': 24})
+    request.user = user
+
+    latencies = [timed(lambda: TrendView.as_view()(request).render())[0] for _ in range(5)]
+
+    # two years of thirty categories, the page has to stay within half a second
+    assert statistics.median(latencies) < 0.5
+    benchmark_results.add('trend_view', len(categories) * 24, median_ms=milliseconds(statistics.median(latencies)))
+
+
+def test_export_memory(client, user, size, benchmark_results):
+    create_categorized_history(user, size)
+    client.force_login(user)
+
+    tracemalloc.start()
+    try:
+        seconds, content_length = timed(
+            lambda: sum(len(chunk) for chunk in client.get('/expenses/export/').streaming_content))
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # the peak shouldn't grow with the size of the export, only the time should
+    benchmark_results.add(
+        'export', size, seconds=round(seconds, 3), rows_per_second=round(size / seconds),
+        content_bytes=content_length, peak_memory_kb=round(peak_bytes / 1024))
+
+
+def test_currency_formatting(size, benchmark_results):
+    amounts = [Decimal(cents).scaleb(-2) for cents in range(-size * 50, size * 50, 100)]
+    uncached = CurrencyFormatter('EUR', 'nl_NL', cache_size=0)
+
+    babel_seconds, _ = timed(lambda: [normalize('NFKD', format_currency(amount, 'EUR', locale='nl_NL'))
+                                      for amount in amounts])
+    formatter_seconds, _ = timed(lambda: [uncached.format(amount) for amount in amounts])
+
+    assert formatter_seconds < babel_seconds
+    benchmark_results.add(
+        'currency_formatting', size, babel_per_amount_us=round(babel_seconds / len(amounts) * 10 ** 6, 3),
+        formatter_per_amount_us=round(formatter_seconds / len(amounts) * 10 ** 6, 3))
@@ -0,0 +1,20 @@
+from homebank.benchmarks.synthetic import SyntheticRabobankExport
+from homebank.transaction_management.parsers import RabobankCsvParser, parsers
+
+
+def test_generates_a_parseable_rabobank_export():
+    export = SyntheticRabobankExport(500)
+    stream = export.stream()
+    parser = parsers.detect(stream.readline())
+
+    rows = parser.parse_chunk(list(parser.reader(stream)))
+
+    assert isinstance(parser, RabobankCsvParser)
+    assert len(rows) == 500
+    assert None not in rows
+    assert len({row.payee for row in rows}) > 20
+
+
+def test_generates_the_same_export_for_a_seed():
+    assert SyntheticRabobankExport(50).content() == SyntheticRabobankExport(50).content()
+    assert SyntheticRabobankExport(50).content() != SyntheticRabobankExport(50, seed=2).content()
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 import pytest
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test import RequestFactory
 
@@ -13,6 +14,12 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def user() -> User:
     return UserFactory()
@@ -28,3 +35,5 @@ def load_fixture_data(django_db_setup, django_db_blocker):
     with django_db_blocker.unblock():
         call_command('loaddata', Path(__file__).parent / "./expenses/tests/fixtures/users.yml")
         call_command('loaddata', Path(__file__).parent / "./expenses/tests/fixtures/transaction_management_small")
+        # loaddata stores raw rows, bypassing the upkeep of the monthly totals
+        call_command('rebuild_monthly_totals')
@@ -0,0 +1,20 @@
+from django import forms
+
+from homebank.transaction_management.exports import export_formats
+from homebank.transaction_management.models import Category
+
+
+class TransactionSearchForm(forms.Form):
+    q = forms.CharField(max_length=200, label='Zoek')
+    date_from = forms.DateField(required=False, label='Van', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='Tot en met', widget=forms.DateInput(attrs={'type': 'date'}))
+    min_amount = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Minimaal bedrag')
+    max_amount = forms.DecimalField(required=False, min_value=0, decimal_places=2, label='Maximaal bedrag')
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+
+class TransactionExportForm(forms.Form):
+    format = forms.ChoiceField(choices=export_formats.choices(), initial='csv', label='Formaat')
+    date_from = forms.DateField(required=False, label='Van', widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label='Tot en met', widget=forms.DateInput(attrs={'type': 'date'}))
+    category = forms.ModelChoiceField(Category.objects.all(), required=False, label='Categorie')
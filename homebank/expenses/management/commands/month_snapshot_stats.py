@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from homebank.expenses.snapshots import month_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Shows how often the month page was served from the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Start counting from zero again')
+
+    def handle(self, *args, **options):
+        stats = month_snapshots.stats()
+        self.stdout.write(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.1%}")
+
+        if options['reset']:
+            month_snapshots.reset_stats()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from homebank.expenses.models import MonthlyCategoryTotal
+from homebank.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the monthly category totals from the stored transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the totals of the user with this username')
+
+    def handle(self, *args, **options):
+        user = User.objects.get(username=options['user']) if options['user'] else None
+        amount = MonthlyCategoryTotal.objects.rebuild(user)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {amount} monthly category total(s)'))
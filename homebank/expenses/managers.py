@@ -0,0 +1,252 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import IntegrityError, models
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, TruncMonth
+from django.db.transaction import atomic
+
+from homebank.utils import month_range
+from .snapshots import month_snapshots
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _as_decimal(value) -> Decimal:
+    return Decimal(str(value)) if value else Decimal(0)
+
+
+class RollupManager(models.Manager):
+    """Adds the amounts of transactions to, and subtracts them from, the rows identified by the key fields"""
+    key_fields = ()
+
+    def _bucket(self, key):
+        return self.get_queryset().filter(**dict(zip(self.key_fields, key)))
+
+    def _add(self, key, delta):
+        first_date = Value(delta['first_date'], output_field=models.DateField())
+        last_date = Value(delta['last_date'], output_field=models.DateField())
+        changes = {
+            'inflow': F('inflow') + delta['inflow'],
+            'outflow': F('outflow') + delta['outflow'],
+            'count': F('count') + delta['count'],
+            'first_date': Least(Coalesce('first_date', first_date), first_date),
+            'last_date': Greatest(Coalesce('last_date', last_date), last_date),
+        }
+
+        if self._bucket(key).update(**changes):
+            return
+
+        try:
+            with atomic():
+                self.create(**dict(zip(self.key_fields, key)), **delta)
+        except IntegrityError:  # created concurrently
+            self._bucket(key).update(**changes)
+
+    def _remove(self, key, delta):
+        bucket = self._bucket(key)
+        bucket.update(inflow=F('inflow') - delta['inflow'], outflow=F('outflow') - delta['outflow'],
+                      count=F('count') - delta['count'])
+        bucket.filter(count__lte=0).delete()
+
+        # the first or last date can't be derived from a delta, recompute them from what's left
+        dates = self._remaining_dates(key)
+
+        if dates['min_date'] is None:
+            return
+
+        bucket.filter(
+            Q(first_date__lt=dates['min_date']) | Q(last_date__gt=dates['max_date'])
+        ).update(first_date=dates['min_date'], last_date=dates['max_date'])
+
+    def _remaining_dates(self, key) -> dict:
+        """
+        :return: dict with the min_date and max_date of what's left in the bucket
+        """
+        raise NotImplementedError
+
+
+class CategoryLifetimeTotalManager(RollupManager):
+    """Keeps the all-time totals of every (user, category) up to date alongside the monthly rollup"""
+    key_fields = ('user_id', 'category_id')
+
+    def add_month_deltas(self, month_deltas: dict):
+        for key, delta in self._per_category(month_deltas).items():
+            self._add(key, delta)
+
+    def remove_month_deltas(self, month_deltas: dict):
+        """Subtracts deltas that were already subtracted from the monthly rollup"""
+        for key, delta in self._per_category(month_deltas).items():
+            self._remove(key, delta)
+
+    def rebuild(self, user=None) -> int:
+        """Recomputes the lifetime totals from the monthly rollup, optionally of a single user
+
+        :return: amount of lifetime total rows
+        """
+        from .models import MonthlyCategoryTotal
+
+        monthly_totals = MonthlyCategoryTotal.objects.all()
+        lifetime_totals = self.get_queryset()
+
+        if user is not None:
+            monthly_totals = monthly_totals.filter(user=user)
+            lifetime_totals = lifetime_totals.filter(user=user)
+
+        totals = monthly_totals.values('user_id', 'category_id').annotate(
+            total_inflow=Sum('inflow'), total_outflow=Sum('outflow'), amount=Sum('count'),
+            min_date=Min('first_date'), max_date=Max('last_date')
+        ).order_by()
+
+        with atomic():
+            lifetime_totals.delete()
+            created = self.bulk_create([
+                self.model(user_id=total['user_id'], category_id=total['category_id'], inflow=total['total_inflow'],
+                           outflow=total['total_outflow'], count=total['amount'], first_date=total['min_date'],
+                           last_date=total['max_date'])
+                for total in totals.iterator()
+            ], batch_size=500)
+
+        return len(created)
+
+    def _per_category(self, month_deltas: dict) -> dict:
+        deltas = {}
+
+        for (user_id, category_id, _), month_delta in month_deltas.items():
+            delta = deltas.get((user_id, category_id))
+
+            if delta is None:
+                deltas[(user_id, category_id)] = dict(month_delta)
+                continue
+
+            delta['inflow'] += month_delta['inflow']
+            delta['outflow'] += month_delta['outflow']
+            delta['count'] += month_delta['count']
+            delta['first_date'] = min(delta['first_date'], month_delta['first_date'])
+            delta['last_date'] = max(delta['last_date'], month_delta['last_date'])
+
+        return deltas
+
+    def _remaining_dates(self, key) -> dict:
+        from .models import MonthlyCategoryTotal
+
+        user_id, category_id = key
+        return MonthlyCategoryTotal.objects.filter(user_id=user_id, category_id=category_id).aggregate(
+            min_date=Min('first_date'), max_date=Max('last_date'))
+
+
+class MonthlyCategoryTotalManager(RollupManager):
+    """Keeps the (user, category, month) rollup of categorized transactions, and the lifetime totals, up to date"""
+    key_fields = ('user_id', 'category_id', 'month')
+
+    def add_transactions(self, transactions):
+        """Adds the amounts of new or newly categorized transactions to their month"""
+        from .models import CategoryLifetimeTotal
+
+        deltas = self._deltas(transactions)
+        for key, delta in deltas.items():
+            self._add(key, delta)
+        CategoryLifetimeTotal.objects.add_month_deltas(deltas)
+
+        month_snapshots.invalidate((user_id, month) for user_id, _, month in deltas)
+
+    def remove_transactions(self, transactions):
+        """Subtracts the amounts of changed or deleted transactions from their month
+
+        :param transactions: the transactions as they were stored before the change
+        """
+        from .models import CategoryLifetimeTotal
+
+        deltas = self._deltas(transactions)
+        for key, delta in deltas.items():
+            self._remove(key, delta)
+        CategoryLifetimeTotal.objects.remove_month_deltas(deltas)
+
+        month_snapshots.invalidate((user_id, month) for user_id, _, month in deltas)
+
+    def for_user_month(self, user, month: date):
+        start, _ = month_range(month)
+        return self.get_queryset().filter(user=user, month=start)
+
+    def trend(self, user, first_month: date, amount_of_months: int):
+        """Gets the balance per category for each month of a range in a single query
+
+        :param first_month: any date within the first month of the range
+        :param amount_of_months: length of the range
+        :return: TrendReport
+        """
+        from .models import TrendReport
+
+        start, _ = month_range(first_month)
+        months = [start + relativedelta(months=offset) for offset in range(amount_of_months)]
+        totals = self.get_queryset().filter(
+            user=user, month__gte=start, month__lt=start + relativedelta(months=amount_of_months)
+        ).values('category_id', 'category__name', 'month', 'inflow', 'outflow')
+
+        return TrendReport(months, totals)
+
+    def rebuild(self, user=None) -> int:
+        """Recomputes the rollup from all transactions, optionally of a single user
+
+        :return: amount of rollup rows
+        """
+        from homebank.transaction_management.models import Transaction
+        from .models import CategoryLifetimeTotal
+
+        transactions = Transaction.objects.filter(category__isnull=False)
+        rollup = self.get_queryset()
+
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            rollup = rollup.filter(user=user)
+
+        totals = transactions.annotate(month=TruncMonth('date')).values(
+            'user_id', 'category_id', 'month'
+        ).annotate(
+            total_inflow=Sum('inflow'), total_outflow=Sum('outflow'), amount=Count('id'),
+            min_date=Min('date'), max_date=Max('date')
+        ).order_by()
+
+        with atomic():
+            rollup.delete()
+            created = self.bulk_create([
+                self.model(user_id=total['user_id'], category_id=total['category_id'], month=total['month'],
+                           inflow=total['total_inflow'] or 0, outflow=total['total_outflow'] or 0,
+                           count=total['amount'], first_date=total['min_date'], last_date=total['max_date'])
+                for total in totals.iterator()
+            ], batch_size=500)
+            CategoryLifetimeTotal.objects.rebuild(user)
+        month_snapshots.invalidate_all()
+
+        return len(created)
+
+    def _deltas(self, transactions) -> dict:
+        deltas = {}
+
+        for transaction in transactions:
+            if transaction.category_id is None:
+                continue
+
+            transaction_date = _as_date(transaction.date)
+            key = (transaction.user_id, transaction.category_id, transaction_date.replace(day=1))
+            delta = deltas.setdefault(key, {'inflow': Decimal(0), 'outflow': Decimal(0), 'count': 0,
+                                            'first_date': transaction_date, 'last_date': transaction_date})
+            delta['inflow'] += _as_decimal(transaction.inflow)
+            delta['outflow'] += _as_decimal(transaction.outflow)
+            delta['count'] += 1
+            delta['first_date'] = min(delta['first_date'], transaction_date)
+            delta['last_date'] = max(delta['last_date'], transaction_date)
+
+        return deltas
+
+    def _remaining_dates(self, key) -> dict:
+        from homebank.transaction_management.models import Transaction
+
+        user_id, category_id, month = key
+        start, end = month_range(month)
+        return Transaction.objects.filter(
+            user_id=user_id, category_id=category_id, date__gte=start, date__lt=end
+        ).aggregate(min_date=Min('date'), max_date=Max('date'))
@@ -0,0 +1,62 @@
+# Generated by Django 3.0.5 on 2026-10-18 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def build_monthly_totals(apps, schema_editor):
+    Transaction = apps.get_model('transaction_management', 'Transaction')
+    MonthlyCategoryTotal = apps.get_model('expenses', 'MonthlyCategoryTotal')
+
+    totals = Transaction.objects.filter(category__isnull=False).annotate(month=TruncMonth('date')).values(
+        'user_id', 'category_id', 'month'
+    ).annotate(
+        total_inflow=Sum('inflow'), total_outflow=Sum('outflow'), amount=Count('id'),
+        min_date=Min('date'), max_date=Max('date')
+    ).order_by()
+
+    MonthlyCategoryTotal.objects.bulk_create([
+        MonthlyCategoryTotal(user_id=total['user_id'], category_id=total['category_id'], month=total['month'],
+                             inflow=total['total_inflow'] or 0, outflow=total['total_outflow'] or 0,
+                             count=total['amount'], first_date=total['min_date'], last_date=total['max_date'])
+        for total in totals.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transaction_management', '0005_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('inflow', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outflow', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('count', models.IntegerField(default=0)),
+                ('first_date', models.DateField(null=True)),
+                ('last_date', models.DateField(null=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to='transaction_management.Category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_category_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='monthlycategorytotal',
+            index=models.Index(fields=['user', 'month'], name='monthly_total_user_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycategorytotal',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'month'), name='unique_monthly_category_total'),
+        ),
+        migrations.RunPython(build_monthly_totals, migrations.RunPython.noop),
+    ]
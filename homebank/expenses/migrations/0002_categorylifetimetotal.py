@@ -0,0 +1,53 @@
+# Generated by Django 3.0.5 on 2026-10-18 06:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min, Sum
+import django.db.models.deletion
+
+
+def build_lifetime_totals(apps, schema_editor):
+    MonthlyCategoryTotal = apps.get_model('expenses', 'MonthlyCategoryTotal')
+    CategoryLifetimeTotal = apps.get_model('expenses', 'CategoryLifetimeTotal')
+
+    totals = MonthlyCategoryTotal.objects.values('user_id', 'category_id').annotate(
+        total_inflow=Sum('inflow'), total_outflow=Sum('outflow'), amount=Sum('count'),
+        min_date=Min('first_date'), max_date=Max('last_date')
+    ).order_by()
+
+    CategoryLifetimeTotal.objects.bulk_create([
+        CategoryLifetimeTotal(user_id=total['user_id'], category_id=total['category_id'],
+                              inflow=total['total_inflow'], outflow=total['total_outflow'], count=total['amount'],
+                              first_date=total['min_date'], last_date=total['max_date'])
+        for total in totals.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_management', '0005_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('expenses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryLifetimeTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inflow', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('outflow', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('first_date', models.DateField(null=True)),
+                ('last_date', models.DateField(null=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lifetime_totals', to='transaction_management.Category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_lifetime_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='categorylifetimetotal',
+            constraint=models.UniqueConstraint(fields=('user', 'category'), name='unique_category_lifetime_total'),
+        ),
+        migrations.RunPython(build_lifetime_totals, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
+from typing import List
+
+from django.conf import settings
+from django.db import models
+
+from homebank.expenses.managers import CategoryLifetimeTotalManager, MonthlyCategoryTotalManager
 
 
 class MonthlyExpenseSummary():
@@ -11,10 +17,11 @@ class MonthlyExpenseSummary():
         self.date_of_month = date_of_month
         self.sum_outflow = category.sum_outflow or 0
         self.sum_inflow = category.sum_inflow or 0
-        self.min_transaction_date = category.min_date
-        self.max_transaction_date = category.max_date
-        self.total_outflow = category.total_outflow or 0
-        self.total_inflow = category.total_inflow or 0
+        # lifetime figures are absent when only the month itself was queried
+        self.min_transaction_date = getattr(category, 'min_date', None)
+        self.max_transaction_date = getattr(category, 'max_date', None)
+        self.total_outflow = getattr(category, 'total_outflow', None) or 0
+        self.total_inflow = getattr(category, 'total_inflow', None) or 0
 
     @property
     def balance_of_month(self):
@@ -49,3 +56,109 @@ class MonthlyExpenseSummary():
             return None
 
         return (self.max_transaction_date.year - self.min_transaction_date.year) * 12 + self.max_transaction_date.month - self.min_transaction_date.month + 1
+
+
+class MonthSnapshot():
+    """The figures of a single month, derived from the per-category summaries of one overview query"""
+    budget_category_name = 'Budget'
+    savings_category_name = 'Sparen'
+
+    def __init__(self, date_of_month: datetime, summaries: List[MonthlyExpenseSummary]):
+        self.date_of_month = date_of_month
+        self.expenses_per_category = [
+            summary for summary in summaries if summary.name != self.budget_category_name]
+        self.total_income = sum(
+            (summary.sum_inflow for summary in summaries if summary.name == self.budget_category_name), Decimal(0))
+        self.total_spent = sum(
+            (summary.balance_of_month for summary in self.expenses_per_category
+             if summary.name != self.savings_category_name), Decimal(0))
+        self.savings = next(
+            (summary.balance_of_month for summary in self.expenses_per_category
+             if summary.name == self.savings_category_name), Decimal(0))
+
+    @property
+    def total_balans(self):
+        return self.total_income + self.total_spent
+
+    @property
+    def total_savings(self):
+        return self.savings - self.total_balans
+
+
+class TrendRow():
+    def __init__(self, category_id: int, name: str, amount_of_months: int):
+        self.category_id = category_id
+        self.name = name
+        self.balances = [Decimal(0)] * amount_of_months
+
+    @property
+    def total(self):
+        return sum(self.balances, Decimal(0))
+
+
+class TrendReport():
+    """The balance per category and month over a range of months, pivoted from the rows of a single query"""
+
+    def __init__(self, months: List[date], totals):
+        self.months = months
+        position_of_month = {month: position for position, month in enumerate(months)}
+        rows = {}
+
+        for total in totals:
+            row = rows.get(total['category_id'])
+            if row is None:
+                row = rows[total['category_id']] = TrendRow(total['category_id'], total['category__name'], len(months))
+
+            row.balances[position_of_month[total['month']]] += total['inflow'] - total['outflow']
+
+        self.rows = sorted(rows.values(), key=lambda row: row.name)
+
+    @property
+    def month_totals(self):
+        return [sum((row.balances[position] for row in self.rows), Decimal(0)) for position in range(len(self.months))]
+
+
+class MonthlyCategoryTotal(models.Model):
+    """Rollup of the categorized transactions of a user per category and month"""
+    objects = MonthlyCategoryTotalManager()
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, models.CASCADE, related_name='monthly_category_totals')
+    category = models.ForeignKey('transaction_management.Category', models.CASCADE, related_name='monthly_totals')
+    month = models.DateField(help_text='First day of the month')
+    inflow = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+    outflow = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+    count = models.IntegerField(default=0)
+    first_date = models.DateField(null=True)
+    last_date = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'month'], name='unique_monthly_category_total')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'month'], name='monthly_total_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} {self.category_id} ({self.user_id})'
+
+
+class CategoryLifetimeTotal(models.Model):
+    """All-time totals of the categorized transactions of a user per category, the base of the monthly averages"""
+    objects = CategoryLifetimeTotalManager()
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, models.CASCADE, related_name='category_lifetime_totals')
+    category = models.ForeignKey('transaction_management.Category', models.CASCADE, related_name='lifetime_totals')
+    inflow = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    outflow = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    count = models.IntegerField(default=0)
+    first_date = models.DateField(null=True)
+    last_date = models.DateField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_category_lifetime_total')
+        ]
+
+    def __str__(self):
+        return f'{self.category_id} ({self.user_id})'
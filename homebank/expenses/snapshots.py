@@ -0,0 +1,90 @@
+from datetime import date
+from typing import Iterable, Tuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.transaction import on_commit
+
+
+class MonthSnapshotCache:
+    """
+    Keeps the snapshot of a month per user in the shared cache.
+
+    Writes drop the snapshot of every (user, month) they touch. Category changes start a new
+    generation, which discards the snapshots of all users at once. Cached snapshots leave out
+    the lifetime totals, so a change in one month doesn't make the other months outdated.
+
+    The invalidations only reach the other processes, e.g. the import worker or a management
+    command, through a cache they share. A per-process cache like LocMemCache is only correct
+    for a single process, such as the tests.
+    """
+    key = 'month-snapshot:{generation}:{user_id}:{month:%Y-%m}'
+    generation_key = 'month-snapshot:generation'
+    hits_key = 'month-snapshot:hits'
+    misses_key = 'month-snapshot:misses'
+    timeout = 60 * 60 * 24 * 7
+
+    def get(self, user, month: date):
+        """Gets the snapshot of the month from the cache, or queries and stores it"""
+        from homebank.transaction_management.models import Category
+
+        key = self._key(self._generation(), user.id, month)
+        snapshot = cache.get(key)
+
+        if snapshot is not None:
+            self._count(self.hits_key)
+            return snapshot
+
+        self._count(self.misses_key)
+        snapshot = Category.objects.snapshot_for_month(month, user, lifetime=False)
+        cache.set(key, snapshot, self.timeout)
+
+        return snapshot
+
+    def invalidate(self, months: Iterable[Tuple[int, date]]):
+        """Drops the snapshots of the touched months
+
+        :param months: list of (user id, any date within the month)
+        """
+        generation = self._generation()
+        keys = {self._key(generation, user_id, month) for user_id, month in months}
+        if not keys:
+            return
+
+        cache.delete_many(keys)
+        # a request running concurrently with the write might have stored the old figures again
+        on_commit(lambda: cache.delete_many(keys))
+
+    def invalidate_all(self):
+        cache.set(self.generation_key, uuid4().hex, None)
+
+    def stats(self) -> dict:
+        counts = cache.get_many([self.hits_key, self.misses_key])
+        hits = counts.get(self.hits_key, 0)
+        misses = counts.get(self.misses_key, 0)
+
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0,
+        }
+
+    def reset_stats(self):
+        cache.delete_many([self.hits_key, self.misses_key])
+
+    def _generation(self) -> str:
+        cache.add(self.generation_key, uuid4().hex, None)
+        return cache.get(self.generation_key)
+
+    def _key(self, generation: str, user_id: int, month: date) -> str:
+        return self.key.format(generation=generation, user_id=user_id, month=month)
+
+    def _count(self, key: str):
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted in between
+            cache.set(key, 1, None)
+
+
+month_snapshots = MonthSnapshotCache()
@@ -1,9 +1,9 @@
 from decimal import Decimal
-from unicodedata import normalize
 
-from babel.numbers import format_currency
 from django import template
 
+from homebank.utils import format_euro
+
 register = template.Library()
 
 
@@ -14,4 +14,4 @@ def absolute_price(number_str):
     if number_str != '':
         price = abs(Decimal(number_str))
 
-    return normalize('NFKD', format_currency(price, 'EUR', locale='nl_NL'))
+    return format_euro(price)
@@ -1,12 +1,12 @@
 from decimal import Decimal
-from unicodedata import normalize
 
-from babel.numbers import format_currency
 from django import template
 
+from homebank.utils import format_euro
+
 register = template.Library()
 
 
 @register.filter
 def price(number_str):
-    return normalize('NFKD', format_currency(Decimal(number_str), 'EUR', locale='nl_NL'))
+    return format_euro(Decimal(number_str))
@@ -6,9 +6,10 @@ from decimal import Decimal
 from typing import List
 
 import pytest
+from django.db.models import Sum
 
 from homebank.expenses.models import MonthlyExpenseSummary
-from homebank.transaction_management.models import Category
+from homebank.transaction_management.models import Category, Transaction
 from homebank.users.models import User
 from homebank.conftest import load_fixture_data
 
@@ -72,3 +73,18 @@ def test_calculates_averages_from_query_results(load_fixture_data, february_over
     assert free_time.average_monthly_balance == Decimal("-11.75")
 
     assert len(budget) == 0
+
+
+def test_snapshot_derives_month_figures_from_one_query(load_fixture_data, february_overview, django_assert_num_queries):
+    user = User.objects.get(username='admin')
+
+    with django_assert_num_queries(1):
+        snapshot = Category.objects.snapshot_for_month(datetime(2020, 2, 1), user)
+
+    spent = [summary.balance_of_month for summary in february_overview if summary.name != 'Sparen']
+    assert sorted(summary.category_id for summary in snapshot.expenses_per_category) == sorted(
+        summary.category_id for summary in february_overview)
+    assert snapshot.total_income == Transaction.objects.filter(
+        user=user, category__name='Budget', date__year=2020, date__month=2).aggregate(Sum('inflow'))['inflow__sum']
+    assert snapshot.total_spent == sum(spent)
+    assert snapshot.total_balans == snapshot.total_income + snapshot.total_spent
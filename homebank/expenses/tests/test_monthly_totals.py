@@ -0,0 +1,114 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from homebank.expenses.models import CategoryLifetimeTotal, MonthlyCategoryTotal
+from homebank.transaction_management.models import Transaction
+from homebank.transaction_management.tests.factories import CategoryFactory, TransactionFactory
+from homebank.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def _totals(user: User) -> dict:
+    return {
+        (total.category_id, total.month): (total.inflow, total.outflow, total.count, total.first_date, total.last_date)
+        for total in MonthlyCategoryTotal.objects.filter(user=user)
+    }
+
+
+def test_adds_saved_transactions_to_their_month(user: User):
+    category = CategoryFactory()
+    TransactionFactory(user=user, category=category, date=date(2020, 4, 3), inflow=None, outflow=10)
+    TransactionFactory(user=user, category=category, date=date(2020, 4, 20), inflow=5, outflow=None)
+    TransactionFactory(user=user, category=None, date=date(2020, 4, 21), inflow=5, outflow=None)
+
+    assert _totals(user) == {
+        (category.id, date(2020, 4, 1)): (Decimal(5), Decimal(10), 2, date(2020, 4, 3), date(2020, 4, 20))
+    }
+
+
+def test_moves_changed_transactions_between_months_and_categories(user: User):
+    category = CategoryFactory()
+    other_category = CategoryFactory()
+    TransactionFactory(user=user, category=category, date=date(2020, 4, 3), inflow=None, outflow=10)
+    transaction = TransactionFactory(user=user, category=category, date=date(2020, 4, 20), inflow=None, outflow=20)
+
+    transaction.date = date(2020, 5, 2)
+    transaction.category = other_category
+    transaction.save()
+
+    assert _totals(user) == {
+        (category.id, date(2020, 4, 1)): (Decimal(0), Decimal(10), 1, date(2020, 4, 3), date(2020, 4, 3)),
+        (other_category.id, date(2020, 5, 1)): (Decimal(0), Decimal(20), 1, date(2020, 5, 2), date(2020, 5, 2)),
+    }
+
+
+def test_removes_deleted_transactions(user: User):
+    category = CategoryFactory()
+    transaction = TransactionFactory(user=user, category=category, date=date(2020, 4, 3), inflow=None, outflow=10)
+    TransactionFactory(user=user, category=category, date=date(2020, 5, 3), inflow=None, outflow=10)
+
+    Transaction.objects.filter(pk=transaction.pk).delete()
+
+    assert list(_totals(user)) == [(category.id, date(2020, 5, 1))]
+
+
+def test_removes_deleted_transactions_in_one_batch(user: User, django_assert_max_num_queries):
+    category = CategoryFactory()
+    TransactionFactory.create_batch(50, user=user, category=category, date=date(2020, 4, 3), inflow=None, outflow=10)
+    TransactionFactory(user=user, category=category, date=date(2020, 5, 3), inflow=None, outflow=10)
+
+    # the rows, a single delete, and the rollup and lifetime upkeep of the one touched month
+    with django_assert_max_num_queries(12):
+        deleted, _ = Transaction.objects.filter(user=user, date__month=4).delete()
+
+    assert deleted == 50
+    assert list(_totals(user)) == [(category.id, date(2020, 5, 1))]
+
+
+def test_rolls_back_a_save_of_which_the_totals_fail(user: User, monkeypatch):
+    def fail(self, stored_transaction):
+        raise RuntimeError('rollup failed')
+
+    monkeypatch.setattr(Transaction, '_update_monthly_totals', fail)
+
+    with pytest.raises(RuntimeError):
+        TransactionFactory(user=user, category=CategoryFactory())
+
+    assert not Transaction.objects.filter(user=user).exists()
+
+
+def _lifetime_totals(user: User) -> dict:
+    return {
+        total.category_id: (total.inflow, total.outflow, total.count, total.first_date, total.last_date)
+        for total in CategoryLifetimeTotal.objects.filter(user=user)
+    }
+
+
+def test_keeps_lifetime_totals_over_all_months(user: User):
+    category = CategoryFactory()
+    first = TransactionFactory(user=user, category=category, date=date(2020, 3, 3), inflow=None, outflow=10)
+    TransactionFactory(user=user, category=category, date=date(2020, 4, 20), inflow=5, outflow=None)
+    last = TransactionFactory(user=user, category=category, date=date(2020, 6, 1), inflow=None, outflow=20)
+
+    assert _lifetime_totals(user) == {category.id: (Decimal(5), Decimal(30), 3, date(2020, 3, 3), date(2020, 6, 1))}
+
+    Transaction.objects.filter(pk__in=[first.pk, last.pk]).delete()
+
+    assert _lifetime_totals(user) == {category.id: (Decimal(5), Decimal(0), 1, date(2020, 4, 20), date(2020, 4, 20))}
+
+
+def test_rebuild_matches_the_incremental_totals(user: User):
+    categories = CategoryFactory.create_batch(3)
+    for category in categories:
+        TransactionFactory.create_batch(5, user=user, category=category, inflow=None)
+    incremental_totals = _totals(user)
+    incremental_lifetime_totals = _lifetime_totals(user)
+
+    call_command('rebuild_monthly_totals')
+
+    assert _totals(user) == incremental_totals
+    assert _lifetime_totals(user) == incremental_lifetime_totals
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+import pytest
+
+from homebank.expenses.snapshots import month_snapshots
+from homebank.transaction_management.models import Transaction
+from homebank.transaction_management.tests.factories import CategoryFactory, TransactionFactory
+from homebank.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+APRIL = datetime(2020, 4, 1)
+MAY = datetime(2020, 5, 1)
+
+
+@pytest.fixture
+def category():
+    return CategoryFactory(name='Uitgaven')
+
+
+def test_serves_repeated_requests_from_the_cache(user: User, category, django_assert_num_queries):
+    TransactionFactory(date=date(2020, 4, 2), user=user, category=category, outflow=50, inflow=0)
+    month_snapshots.get(user, APRIL)
+
+    with django_assert_num_queries(0):
+        snapshot = month_snapshots.get(user, APRIL)
+
+    assert snapshot.total_spent == -50
+    assert month_snapshots.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_drops_only_the_month_a_transaction_touches(user: User, category, django_assert_num_queries):
+    month_snapshots.get(user, APRIL)
+    month_snapshots.get(user, MAY)
+
+    TransactionFactory(date=date(2020, 4, 2), user=user, category=category, outflow=50, inflow=0)
+
+    with django_assert_num_queries(0):
+        month_snapshots.get(user, MAY)
+    assert month_snapshots.get(user, APRIL).total_spent == -50
+
+
+def test_drops_the_month_of_changed_and_deleted_transactions(user: User, category):
+    transaction = TransactionFactory(date=date(2020, 4, 2), user=user, category=category, outflow=50, inflow=0)
+    month_snapshots.get(user, APRIL)
+
+    transaction.outflow = 20
+    transaction.save()
+    assert month_snapshots.get(user, APRIL).total_spent == -20
+
+    Transaction.objects.filter(pk=transaction.pk).delete()
+    assert month_snapshots.get(user, APRIL).total_spent == 0
+
+
+def test_drops_all_months_when_a_category_changes(user: User, category):
+    TransactionFactory(date=date(2020, 4, 2), user=user, category=category, outflow=50, inflow=0)
+    month_snapshots.get(user, APRIL)
+
+    category.name = 'Vakantie'
+    category.save()
+
+    assert 'Vakantie' in [summary.name for summary in month_snapshots.get(user, APRIL).expenses_per_category]
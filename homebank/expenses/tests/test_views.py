@@ -1,3 +1,4 @@
+import json
 from decimal import Decimal
 
 import pytest
@@ -11,8 +12,12 @@ from testfixtures import Replace, test_datetime
 from homebank.users.models import User
 from ..views import (
     RedirectToMonthView,
-    MonthView
+    MonthView,
+    MonthTransactionsView,
+    TrendView
 )
+from ..models import MonthlyCategoryTotal
+from ...transaction_management.models import Transaction
 from ...transaction_management.tests.factories import TransactionFactory, CategoryFactory
 
 pytestmark = pytest.mark.django_db
@@ -74,9 +79,178 @@ def test_shows_total_expenses(rf, user: User):
     assertContains(response, '€ 66,00')
 
 
+def test_renders_month_in_a_single_query(rf, user: User, django_assert_num_queries):
+    category = CategoryFactory(name='Uitgaven')
+    TransactionFactory.create_batch(3, date=date(2020, 4, 1), user=user, category=category, outflow=50, inflow=0)
+
+    with django_assert_num_queries(1):
+        _navigate_to_month(rf, user, "2020-04").render()
+
+
+def test_shows_balance_per_category_and_month(rf, user: User):
+    category = CategoryFactory(name='Uitgaven')
+    TransactionFactory(date=date(2020, 3, 1), user=user, category=category, outflow=40, inflow=0)
+    TransactionFactory(date=date(2020, 4, 1), user=user, category=category, outflow=35, inflow=0)
+
+    response = _navigate_to_trend(rf, user, until="2020-04", months=2)
+
+    assertContains(response, 'Uitgaven')
+    assertContains(response, '€ -40,00')
+    assertContains(response, '€ -35,00')
+    assertContains(response, '€ -75,00', count=1)
+
+
+def test_renders_two_years_of_thirty_categories_in_a_single_query(rf, user: User, django_assert_num_queries):
+    categories = CategoryFactory.create_batch(30)
+    MonthlyCategoryTotal.objects.bulk_create([
+        MonthlyCategoryTotal(user=user, category=category, month=date(2018 + month // 12, month % 12 + 1, 1),
+                             inflow=0, outflow=month + 1, count=1)
+        for category in categories for month in range(24)
+    ])
+
+    with django_assert_num_queries(1):
+        _navigate_to_trend(rf, user, until="2019-12", months=24).render()
+
+
+def _navigate_to_trend(rf: RequestFactory, user: User, **params) -> HttpResponse:
+    request = rf.get(reverse("expenses:trend"), params)
+    request.user = user
+    return TrendView.as_view()(request)
+
+
 def _navigate_to_month(rf: RequestFactory, user: User, month_str: str) -> HttpResponse:
     request_kwargs = {"date": "2020-04"}
     url = reverse("expenses:month", kwargs=request_kwargs)
     request = rf.get(url)
     request.user = user
     return MonthView.as_view()(request, **request_kwargs)
+
+
+def test_searches_transactions(client, user: User):
+    client.force_login(user)
+    TransactionFactory.create_batch(3, user=user, payee='Albert Heijn 1234 SITTARD')
+    TransactionFactory(user=user, payee='Spotify')
+
+    response = client.get(reverse('expenses:search'), {'q': 'albert heijn'})
+
+    assert response.status_code == 200
+    assert len(response.context['page']) == 3
+    assertContains(response, 'Albert Heijn 1234 SITTARD', count=3)
+
+
+def test_search_shows_the_next_page(client, user: User, monkeypatch):
+    monkeypatch.setattr(Transaction.objects, 'search_page_size', 2)
+    client.force_login(user)
+    TransactionFactory.create_batch(3, user=user, payee='Spotify')
+
+    response = client.get(reverse('expenses:search'), {'q': 'spotify'})
+    next_response = client.get(f"{reverse('expenses:search')}?{response.context['next_page_query']}")
+
+    assert len(response.context['page']) == 2
+    assert len(next_response.context['page']) == 1
+    assert not next_response.context['page'].has_next()
+
+
+def test_search_rejects_an_invalid_cursor(client, user: User):
+    client.force_login(user)
+
+    response = client.get(reverse('expenses:search'), {'q': 'spotify', 'cursor': 'not a cursor'})
+
+    assert response.status_code == 200
+    assert 'page' not in response.context
+    assertContains(response, 'This page does not exist')
+
+
+def test_lists_the_transactions_of_a_category_in_a_month(client, user: User):
+    client.force_login(user)
+    category = CategoryFactory(name='Boodschappen')
+    TransactionFactory.create_batch(2, user=user, category=category, date=date(2020, 4, 1), payee='Albert Heijn')
+    TransactionFactory(user=user, category=category, date=date(2020, 5, 1), payee='Jumbo')
+
+    response = client.get(reverse('expenses:month_transactions', kwargs={'date': '2020-04'}),
+                          {'category': category.id})
+
+    assert len(response.context['page']) == 2
+    assertContains(response, 'Boodschappen')
+    assertContains(response, 'Albert Heijn', count=2)
+    assert not response.context['page'].has_next()
+
+
+def test_month_transactions_show_the_next_page(client, user: User):
+    client.force_login(user)
+    category = CategoryFactory()
+    TransactionFactory.create_batch(3, user=user, category=category, date=date(2020, 4, 1))
+    url = reverse('expenses:month_transactions', kwargs={'date': '2020-04'})
+
+    response = client.get(url, {'category': category.id, 'per_page': 2})
+    next_response = client.get(f"{url}?{response.context['next_page_query']}")
+
+    assertContains(response, 'Volgende')
+    assert len(next_response.context['page']) == 1
+
+
+def test_streams_large_pages_of_month_transactions(client, user: User, monkeypatch):
+    monkeypatch.setattr(MonthTransactionsView, 'stream_threshold', 2)
+    monkeypatch.setattr(MonthTransactionsView, 'chunk_size', 2)
+    client.force_login(user)
+    category = CategoryFactory()
+    TransactionFactory.create_batch(5, user=user, category=category, date=date(2020, 4, 1), payee='Spotify')
+
+    response = client.get(reverse('expenses:month_transactions', kwargs={'date': '2020-04'}),
+                          {'category': category.id, 'per_page': 4})
+    content = b''.join(response.streaming_content).decode()
+
+    assert response.streaming
+    assert content.count('Spotify') == 4
+    assert content.index('Spotify') < content.index('Volgende') < content.index('</html>')
+
+
+def test_month_transactions_reject_an_invalid_cursor(client, user: User):
+    client.force_login(user)
+
+    response = client.get(reverse('expenses:month_transactions', kwargs={'date': '2020-04'}), {'cursor': 'x'})
+
+    assert response.status_code == 404
+
+
+def test_month_links_to_the_transactions_of_a_category(rf, user: User):
+    category = CategoryFactory(name='Uitgaven')
+    TransactionFactory(date=date(2020, 4, 1), user=user, category=category, outflow=50, inflow=0)
+
+    response = _navigate_to_month(rf, user, "2020-04")
+
+    assertContains(response, f'/expenses/2020-04/transactions/?category={category.id}')
+
+
+def test_exports_the_transactions_as_csv(client, user: User):
+    client.force_login(user)
+    TransactionFactory.create_batch(3, user=user, date=date(2020, 4, 1), payee='Spotify')
+    TransactionFactory(date=date(2020, 4, 1), payee='Spotify')
+
+    response = client.get(reverse('expenses:export'), {'format': 'csv', 'date_from': '2020-04-01'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+
+    assert response['Content-Disposition'] == 'attachment; filename="transactions.csv"'
+    assert lines[0].startswith('date,payee,memo')
+    assert len(lines) == 4
+
+
+def test_exports_the_transactions_of_a_category_as_ndjson(client, user: User):
+    client.force_login(user)
+    category = CategoryFactory(name='Abonnementen')
+    TransactionFactory(user=user, category=category, payee='Spotify')
+    TransactionFactory(user=user, payee='Albert Heijn')
+
+    response = client.get(reverse('expenses:export'), {'format': 'ndjson', 'category': category.id})
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+    assert [(row['payee'], row['category']) for row in rows] == [('Spotify', 'Abonnementen')]
+
+
+def test_export_rejects_an_unknown_format(client, user: User):
+    client.force_login(user)
+
+    response = client.get(reverse('expenses:export'), {'format': 'xlsx'})
+
+    assert response.status_code == 400
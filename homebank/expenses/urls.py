@@ -9,7 +9,26 @@ urlpatterns = [
         view=views.RedirectToMonthView.as_view(),
         name='home'
     ),
+    path(
+        route='export/',
+        view=views.ExportView.as_view(),
+        name='export'
+    ),
+    path(
+        route='search/',
+        view=views.SearchView.as_view(),
+        name='search'
+    ),
+    path(
+        route='trend/',
+        view=views.TrendView.as_view(),
+        name='trend'
+    ),
     re_path(
         route=r'^(?P<date>\d{4}-\d{2})/$', view=views.MonthView.as_view(), name='month'
-    )
+    ),
+    re_path(
+        route=r'^(?P<date>\d{4}-\d{2})/transactions/$', view=views.MonthTransactionsView.as_view(),
+        name='month_transactions'
+    ),
 ]
@@ -2,10 +2,18 @@ from datetime import datetime
 
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.views.generic import TemplateView, RedirectView
+from django.views.generic import TemplateView, RedirectView, View
 
+from homebank.expenses.forms import TransactionExportForm, TransactionSearchForm
+from homebank.expenses.models import MonthlyCategoryTotal
+from homebank.expenses.snapshots import month_snapshots
+from homebank.transaction_management.exports import export_formats
 from homebank.transaction_management.models import Category, Transaction
+from homebank.utils import KeysetStream
 
 
 class RedirectToMonthView(LoginRequiredMixin, RedirectView):  # TODO: I know this needs to be a normal TemplateView
@@ -23,21 +31,17 @@ class MonthView(LoginRequiredMixin, TemplateView):
         date = datetime.strptime(date_str, '%Y-%m')
         user = self.request.user
 
-        expenses_per_category = Category.objects.overview_for_month(date, user)
-        total_income = Transaction.objects.total_budget_for_month(date, user)
-        total_spent = Transaction.objects.total_spent_for_month(date, user)
-        total_balans = total_income + total_spent
-        savings = self._get_savings_from_overview(expenses_per_category)
+        snapshot = month_snapshots.get(user, date)
 
         context['date_previous'] = self._get_date_with_month_offset(date, -1)
         context['date_next'] = self._get_date_with_month_offset(date, 1)
         context['date'] = date_str
-        context['total_income'] = total_income
-        context['total_spent'] = total_spent
-        context['expenses_per_category'] = expenses_per_category
-        context['total_balans'] = total_balans
-        context['total_savings'] = savings - total_balans
-        context['savings'] = savings * -1
+        context['total_income'] = snapshot.total_income
+        context['total_spent'] = snapshot.total_spent
+        context['expenses_per_category'] = snapshot.expenses_per_category
+        context['total_balans'] = snapshot.total_balans
+        context['total_savings'] = snapshot.total_savings
+        context['savings'] = snapshot.savings * -1
 
         return context
 
@@ -47,11 +51,179 @@ class MonthView(LoginRequiredMixin, TemplateView):
     def _date_to_month_str(self, date: datetime) -> str:
         return datetime.strftime(date, '%Y-%m')
 
-    def _get_savings_from_overview(self, expenses_per_category):
+
+class TrendView(LoginRequiredMixin, TemplateView):
+    """Compares the categories over a range of months, e.g. `?until=2020-04&months=24`"""
+    template_name = "expenses/trend.html"
+    default_amount_of_months = 12
+    max_amount_of_months = 60
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        until = self._get_last_month()
+        amount_of_months = self._get_amount_of_months()
+        first_month = until - relativedelta(months=amount_of_months - 1)
+
+        context['report'] = MonthlyCategoryTotal.objects.trend(self.request.user, first_month, amount_of_months)
+        context['until'] = datetime.strftime(until, '%Y-%m')
+        context['amount_of_months'] = amount_of_months
+
+        return context
+
+    def _get_last_month(self) -> datetime:
+        try:
+            return datetime.strptime(self.request.GET.get('until', ''), '%Y-%m')
+        except ValueError:
+            return datetime.now() - relativedelta(months=1)
+
+    def _get_amount_of_months(self) -> int:
+        try:
+            amount_of_months = int(self.request.GET.get('months', self.default_amount_of_months))
+        except ValueError:
+            return self.default_amount_of_months
+
+        return min(max(amount_of_months, 1), self.max_amount_of_months)
+
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    """Searches the transactions by payee and memo, e.g. `?q=albert heijn&date_from=2020-01-01`"""
+    template_name = "expenses/search.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = TransactionSearchForm(self.request.GET or None)
+        context['form'] = form
+
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                context['page'] = Transaction.objects.search(
+                    self.request.user, data['q'], date_from=data['date_from'], date_to=data['date_to'],
+                    min_amount=data['min_amount'], max_amount=data['max_amount'], cursor=data['cursor'])
+            except ValueError:
+                form.add_error('cursor', 'This page does not exist')
+            else:
+                next_page = self.request.GET.copy()
+                next_page['cursor'] = context['page'].next_cursor
+                context['next_page_query'] = next_page.urlencode()
+
+        return context
+
+
+class MonthTransactionsView(LoginRequiredMixin, TemplateView):
+    """
+    The transactions of a month, of a single category with `?category=<id>`, the newest first.
+    Pages of more than `stream_threshold` transactions, e.g. `?per_page=5000`, are streamed: the
+    rows are rendered a chunk at a time while they are read from the database.
+    """
+    template_name = "expenses/month_transactions.html"
+    rows_template_name = "expenses/month_transaction_rows.html"
+    next_page_template_name = "expenses/next_page.html"
+    max_per_page = 5000
+    stream_threshold = 500
+    chunk_size = 500
+    # placeholders in the rendered page that are replaced by the streamed rows and the link to the next page
+    rows_marker = '<!-- transactions -->'
+    next_page_marker = '<!-- next page -->'
+
+    def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        paginator = context['paginator']
+
+        try:
+            if paginator.per_page > self.stream_threshold:
+                return self._stream(context, paginator.stream(request.GET.get('cursor'), self.chunk_size))
+
+            context['page'] = paginator.page(request.GET.get('cursor'))
+        except ValueError:
+            raise Http404('This page does not exist')
+
+        context['next_page_query'] = self._next_page_query(context['page'].next_cursor)
+        return self.render_to_response(context)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        month = datetime.strptime(kwargs['date'], '%Y-%m').date()
+        category = self._get_category()
+
+        context['date'] = kwargs['date']
+        context['category'] = category
+        context['paginator'] = Transaction.objects.month_transactions(
+            self.request.user, month, category_id=category.id if category else None,
+            per_page=self._get_per_page())
+
+        return context
+
+    def _get_category(self):
+        category_id = self.request.GET.get('category')
+        if not category_id:
+            return None
+
+        if not category_id.isdigit():
+            raise Http404('Unknown category')
+
+        return get_object_or_404(Category.objects.only('name'), pk=category_id)
+
+    def _get_per_page(self):
         try:
-            savings = next(
-                summary for summary in expenses_per_category if summary.category.name == 'Sparen').balance_of_month
-        except StopIteration:
-            savings = 0
+            per_page = int(self.request.GET.get('per_page', Transaction.objects.month_page_size))
+        except ValueError:
+            return None
+
+        return min(max(per_page, 1), self.max_per_page)
+
+    def _next_page_query(self, cursor) -> str:
+        next_page = self.request.GET.copy()
+        next_page['cursor'] = cursor
+        return next_page.urlencode()
+
+    def _stream(self, context, page: KeysetStream) -> StreamingHttpResponse:
+        context['page'] = page
+        context['streamed'] = True
+        head, rest = render_to_string(self.template_name, context, self.request).split(self.rows_marker)
+        middle, tail = rest.split(self.next_page_marker)
+
+        def render():
+            yield head
+
+            chunk, rendered_rows = [], False
+            for transaction in page:
+                chunk.append(transaction)
+                if len(chunk) == self.chunk_size:
+                    yield render_to_string(self.rows_template_name, {'transactions': chunk})
+                    chunk, rendered_rows = [], True
+
+            # renders the message of an empty page when there were no transactions at all
+            if chunk or not rendered_rows:
+                yield render_to_string(self.rows_template_name, {'transactions': chunk})
+
+            yield middle
+            if page.has_next():
+                yield render_to_string(self.next_page_template_name,
+                                       {'next_page_query': self._next_page_query(page.next_cursor)})
+            yield tail
+
+        return StreamingHttpResponse(render(), content_type='text/html; charset=utf-8')
+
+
+class ExportView(LoginRequiredMixin, View):
+    """Downloads the transactions as csv or ndjson, e.g. `?format=ndjson&date_from=2020-01-01&category=3`"""
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        form = TransactionExportForm(request.GET or {'format': 'csv'})
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text(), content_type='text/plain')
+
+        data = form.cleaned_data
+        rows = Transaction.objects.for_export(
+            request.user, date_from=data['date_from'], date_to=data['date_to'],
+            category_id=data['category'].id if data['category'] else None)
+        export_format = export_formats.get(data['format'])
+
+        # the rows are read from the database while they're sent, so memory doesn't grow with the export
+        response = StreamingHttpResponse(export_format.lines(rows.iterator(chunk_size=self.chunk_size)),
+                                         content_type=f'{export_format.content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format.extension}"'
 
-        return savings
+        return response
@@ -1,14 +1,17 @@
 from io import TextIOWrapper
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.admin import SimpleListFilter
+from django.core.exceptions import ValidationError
 from django.http import HttpRequest
 from django.shortcuts import redirect, render
 # Register your models here.
 from django.urls import path
 
-from .forms import CsvImportForm
-from .models import Transaction, Category
+from homebank.utils import EstimatedCountPaginator
+from .forms import AssignCategoryForm, CsvImportForm
+from .managers import FileParseResult, KnownCodes
+from .models import Transaction, Category, ImportJob
 
 
 class CategoryAssignFilter(SimpleListFilter):
@@ -39,31 +42,79 @@ class CategoryAssignFilter(SimpleListFilter):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('id', 'date', 'category', 'payee', 'inflow', 'outflow', 'memo')
     list_filter = ['category', CategoryAssignFilter]
+    list_select_related = ('category',)
     readonly_fields = ('to_account_number', 'date', 'payee', 'memo')
+    # backed by trigram indexes on PostgreSQL, see migrations.utils.trigram_indexes
     search_fields = ['payee', 'memo']
+    # the table holds hundreds of thousands of rows, don't count all of them on every page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['assign_category']
     change_list_template = "admin/transaction_management/change_list.html"
 
     def get_urls(self):
         urls = super().get_urls()
         additional_urls = [
-            path('import-csv/', self.import_csv)
+            path('import-csv/', self.import_csv, name='transaction_management_transaction_import_csv')
         ]
 
         return additional_urls + urls
 
+    def assign_category(self, request: HttpRequest, queryset):
+        form = AssignCategoryForm(request.POST if 'apply' in request.POST else None)
+
+        if not form.is_valid():
+            return render(request, "admin/transaction_management/assign_category.html", {
+                "form": form,
+                "transactions": queryset,
+                "action_checkbox_name": admin.ACTION_CHECKBOX_NAME,
+                "opts": self.model._meta,
+            })
+
+        category = form.cleaned_data['category']
+        result = Transaction.objects.assign_category(queryset, category)
+        self.message_user(request, f"Assigned {category.name} to {result.amount_assigned} transaction(s), "
+                                   f"{result.amount_propagated} similar transaction(s) were categorized as well")
+
+        return None
+
+    assign_category.short_description = 'Assign a category to the selected transactions'
+
     def import_csv(self, request: HttpRequest):
         if request.method == 'POST':
             form = CsvImportForm(request.POST, request.FILES)
 
             if form.is_valid():
-                uploaded_file = request.FILES['csv_file']
+                uploaded_files = form.cleaned_data['csv_file']
+
+                if len(uploaded_files) > 1:
+                    return self._import_csv_files(request, form, uploaded_files)
+
+                uploaded_file = uploaded_files[0]
+
+                file = TextIOWrapper(uploaded_file.file, encoding='latin-1', newline='')
+                in_background = form.cleaned_data['categorize_in_background']
+
+                try:
+                    if form.cleaned_data['preview']:
+                        preview = Transaction.objects.preview_file(file, request.user, parser=form.get_parser())
+                        return render(request, "admin/transaction_management/import_preview.html",
+                                      {"preview": preview, "file_name": uploaded_file.name})
 
-                file = TextIOWrapper(uploaded_file.file, encoding='latin-1')
-                result = Transaction.objects.create_from_file(file, request.user)
+                    result = Transaction.objects.create_from_file(file, request.user, categorize=not in_background,
+                                                                  parser=form.get_parser())
+                except ValidationError as error:
+                    self.message_user(request, ' '.join(error.messages), level=messages.ERROR)
+                    return redirect("..")
 
                 # do something here
                 self.message_user(request,
                                   f"Import result: {result.amount_successful} successful, {result.amount_duplicate} duplicate(s), {result.amount_faulty} failed")
+
+                if in_background:
+                    self._queue_import_job(request, uploaded_file.name, result)
+                    self.message_user(request, "Categorization is queued, follow its progress under Import jobs")
+
                 return redirect("..")
         else:
             form = CsvImportForm()
@@ -72,6 +123,70 @@ class TransactionAdmin(admin.ModelAdmin):
             request, "admin/transaction_management/csv_form.html", {"form": form}
         )
 
+    def _import_csv_files(self, request: HttpRequest, form: CsvImportForm, uploaded_files):
+        if form.cleaned_data['preview']:
+            self.message_user(request, 'A preview can only be made of a single file', level=messages.ERROR)
+            return redirect("..")
+
+        in_background = form.cleaned_data['categorize_in_background']
+        # the files are streamed one after the other, the parallel import is left to the import_transactions command
+        known_codes = KnownCodes(Transaction.objects.all())
+        results = {}
+
+        for uploaded_file in uploaded_files:
+            file = TextIOWrapper(uploaded_file.file, encoding='latin-1', newline='')
+
+            try:
+                results[uploaded_file.name] = Transaction.objects.create_from_file(
+                    file, request.user, categorize=not in_background, parser=form.get_parser(),
+                    known_codes=known_codes)
+            except ValidationError as error:
+                self.message_user(request, f"Import of {uploaded_file.name} failed: {' '.join(error.messages)}",
+                                  level=messages.ERROR)
+
+        for file_name, result in results.items():
+            self.message_user(request, f"Import result of {file_name}: {result.amount_successful} successful, "
+                                       f"{result.amount_duplicate} duplicate(s), {result.amount_faulty} failed")
+
+        if in_background and results:
+            # a job categorizes all uncategorized transactions of the user, one job covers every file
+            total = FileParseResult()
+            for result in results.values():
+                total.amount_successful += result.amount_successful
+                total.amount_duplicate += result.amount_duplicate
+                total.amount_faulty += result.amount_faulty
+
+            self._queue_import_job(request, ', '.join(results)[:ImportJob._meta.get_field('file_name').max_length],
+                                   total)
+            self.message_user(request, "Categorization is queued, follow its progress under Import jobs")
+
+        return redirect("..")
+
+    def _queue_import_job(self, request: HttpRequest, file_name: str, result) -> ImportJob:
+        return ImportJob.objects.create(
+            user=request.user,
+            file_name=file_name,
+            amount_successful=result.amount_successful,
+            amount_duplicate=result.amount_duplicate,
+            amount_faulty=result.amount_faulty
+        )
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file_name', 'user', 'status', 'progress_display', 'amount_successful',
+                    'amount_duplicate', 'amount_faulty', 'amount_categorized', 'created_at', 'finished_at')
+    list_filter = ['status']
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
+
+    def progress_display(self, job: ImportJob) -> str:
+        return f'{job.progress}%'
+
+    progress_display.short_description = 'Progress'
+
+    def has_add_permission(self, request):
+        return False
+
 
 admin.site.register(Transaction, TransactionAdmin)
 admin.site.register(Category)
+admin.site.register(ImportJob, ImportJobAdmin)
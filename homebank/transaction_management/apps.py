@@ -7,3 +7,4 @@ class TransactionManagementConfig(AppConfig):
 
     def ready(self):
         register_serializer('yml', 'django.core.serializers.pyyaml')
+        from . import signals  # noqa F401
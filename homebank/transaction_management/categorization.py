@@ -0,0 +1,268 @@
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.transaction import atomic
+from rapidfuzz import fuzz, process, utils
+
+from homebank.expenses.models import MonthlyCategoryTotal
+
+
+class CategorizationIndex:
+    """
+    The unique categorized descriptions of a single user, preprocessed once so a lookup
+    only has to score the query against a prebuilt list of choices
+    """
+    workers = -1
+
+    def __init__(self, version: str):
+        self.version = version
+        self._choices = []
+        self._category_by_choice = {}
+
+    def __len__(self):
+        return len(self._choices)
+
+    def add(self, description: str, category_id: int):
+        choice = utils.default_process(description)
+
+        if choice not in self._category_by_choice:
+            self._choices.append(choice)
+
+        self._category_by_choice[choice] = category_id
+
+    def match(self, description: str, score_cutoff: float) -> Optional[int]:
+        """Finds the category of the most similar categorized description
+
+        :param description: description of the transaction to categorize
+        :param score_cutoff: minimal similarity score for a match
+        :return: category id or None when nothing is similar enough
+        """
+        if not self._choices:
+            return None
+
+        best_match = process.extractOne(utils.default_process(description), self._choices, processor=None,
+                                        score_cutoff=score_cutoff)
+
+        return self._category_by_choice[best_match[0]] if best_match else None
+
+    def match_many(self, descriptions: List[str], score_cutoff: float) -> List[Optional[int]]:
+        """Finds the category for many descriptions, scoring every distinct description once
+
+        Each description is looked up with `extractOne`, which raises its cutoff to the best score
+        found so far and skips choices that can't beat it. A full score matrix (`cdist`) can't prune
+        like that and was slower, even per row, than looking the descriptions up one by one.
+
+        :param descriptions: descriptions of the transactions to categorize
+        :param score_cutoff: minimal similarity score for a match
+        :return: category id or None for each description
+        """
+        if not self._choices:
+            return [None] * len(descriptions)
+
+        queries = [utils.default_process(description) for description in descriptions]
+        # an export repeats the same description for e.g. every month of a subscription
+        categories = {}
+
+        for query in queries:
+            if query not in categories:
+                best_match = process.extractOne(query, self._choices, processor=None, score_cutoff=score_cutoff)
+                categories[query] = self._category_by_choice[best_match[0]] if best_match else None
+
+        return [categories[query] for query in queries]
+
+
+class CategorizationIndexRegistry:
+    """
+    Keeps the categorization index of the most recently used users in memory.
+
+    Every change gets a new version in the shared cache, so other processes notice their copy
+    is outdated and rebuild it on the next lookup. Deleting a category starts a new generation,
+    which outdates the indexes of all users at once. The versions only reach the other processes
+    through a shared cache, see MonthSnapshotCache.
+    """
+    version_key = 'categorization-index:{generation}:{user_id}'
+    generation_key = 'categorization-index:generation'
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._indexes = OrderedDict()
+
+    def get(self, user_id: int) -> CategorizationIndex:
+        version = self._current_version(user_id)
+        index = self._indexes.get(user_id)
+
+        if index is None or index.version != version:
+            index = self._build(user_id, version)
+            self._indexes[user_id] = index
+
+        self._indexes.move_to_end(user_id)
+        while len(self._indexes) > self.max_size:
+            self._indexes.popitem(last=False)
+
+        return index
+
+    def add(self, user_id: int, descriptions: List[Tuple[str, int]]):
+        """Adds newly categorized descriptions to the index of the user
+
+        :param user_id: id of the owner of the transactions
+        :param descriptions: list of (description, category id)
+        """
+        if not descriptions:
+            return
+
+        previous_version = self._current_version(user_id)
+        version = self._new_version(user_id)
+        index = self._indexes.get(user_id)
+
+        if index is None or index.version != previous_version:
+            self._indexes.pop(user_id, None)
+            return
+
+        for description, category_id in descriptions:
+            index.add(description, category_id)
+
+        index.version = version
+
+    def drop(self, user_id: int):
+        """Discards the index of the user, it gets rebuilt on the next lookup"""
+        self._new_version(user_id)
+        self._indexes.pop(user_id, None)
+
+    def drop_all(self):
+        """Discards the indexes of all users, e.g. when a category they refer to is deleted"""
+        cache.set(self.generation_key, uuid4().hex, None)
+        self._indexes.clear()
+
+    def _current_version(self, user_id: int) -> str:
+        key = self._version_key(user_id)
+        cache.add(key, uuid4().hex, None)
+        return cache.get(key)
+
+    def _new_version(self, user_id: int) -> str:
+        version = uuid4().hex
+        cache.set(self._version_key(user_id), version, None)
+        return version
+
+    def _version_key(self, user_id: int) -> str:
+        cache.add(self.generation_key, uuid4().hex, None)
+        return self.version_key.format(generation=cache.get(self.generation_key), user_id=user_id)
+
+    def _build(self, user_id: int, version: str) -> CategorizationIndex:
+        from homebank.transaction_management.models import Transaction
+
+        index = CategorizationIndex(version)
+        categorized = Transaction.objects.filter(
+            user_id=user_id, category__isnull=False
+        ).values_list('payee', 'memo', 'category_id')
+
+        for payee, memo, category_id in categorized.iterator():
+            index.add(f'{payee} - {memo}', category_id)
+
+        return index
+
+
+categorization_indexes = CategorizationIndexRegistry()
+
+
+def categorize_uncategorized(user_id: int, score_threshold: float, chunk_size: int = 1000,
+                             on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Assigns a category to every uncategorized transaction of the user that looks like a categorized one
+
+    :param user_id: id of the owner of the transactions
+    :param score_threshold: minimal similarity score for a match
+    :param chunk_size: amount of transactions matched and updated at once
+    :param on_progress: called with (processed, total) after every chunk
+    :return: amount of transactions that got a category
+    """
+    from homebank.transaction_management.models import Transaction
+
+    uncategorized_ids = list(
+        Transaction.objects.filter(user_id=user_id, category__isnull=True).order_by('pk').values_list('pk', flat=True))
+    amount_categorized = 0
+
+    for start in range(0, len(uncategorized_ids), chunk_size):
+        uncategorized = list(Transaction.objects.filter(
+            pk__in=uncategorized_ids[start:start + chunk_size], category__isnull=True
+        ).only('payee', 'memo', *Transaction.rollup_fields))
+        category_ids = categorization_indexes.get(user_id).match_many(
+            [transaction.description for transaction in uncategorized], score_threshold)
+
+        categorized = []
+        for transaction, category_id in zip(uncategorized, category_ids):
+            if category_id is not None:
+                transaction.category_id = category_id
+                categorized.append(transaction)
+
+        with atomic():
+            Transaction.objects.bulk_update(categorized, ['category'], batch_size=500)
+            MonthlyCategoryTotal.objects.add_transactions(categorized)
+        categorization_indexes.add(user_id, [(transaction.description, transaction.category_id)
+                                             for transaction in categorized])
+        amount_categorized += len(categorized)
+
+        if on_progress:
+            on_progress(min(start + chunk_size, len(uncategorized_ids)), len(uncategorized_ids))
+
+    return amount_categorized
+
+
+def propagate_categories(user_id: int, seeds: List[Tuple[str, int]], score_threshold: float,
+                         limit: Optional[int] = None) -> int:
+    """
+    Gives the category of the seeds to every uncategorized transaction reachable through a chain of similar
+    descriptions. Runs as a single pass over a worklist and stores all assignments in one batch.
+
+    Unlike CategorizationIndex.match_many, which only needs the best match of a description and
+    prunes with extractOne, a worklist item categorizes every remaining description above the
+    threshold. There is no best score to raise the cutoff to, so one row of scores per item is
+    the least work, and the fixed `score_cutoff` still lets every pair stop scoring early.
+
+    :param user_id: id of the owner of the transactions
+    :param seeds: list of (description, category id) of freshly categorized transactions
+    :param score_threshold: similarity score a description has to exceed
+    :param limit: maximum amount of transactions to categorize, defaults to settings.CATEGORY_PROPAGATION_LIMIT
+    :return: amount of transactions that got a category
+    """
+    from homebank.transaction_management.models import Transaction
+
+    limit = settings.CATEGORY_PROPAGATION_LIMIT if limit is None else limit
+    uncategorized = list(Transaction.objects.filter(
+        user_id=user_id, category__isnull=True
+    ).only('payee', 'memo', *Transaction.rollup_fields))
+    descriptions = [utils.default_process(transaction.description) for transaction in uncategorized]
+    remaining = list(range(len(uncategorized)))
+    worklist = [(utils.default_process(description), category_id) for description, category_id in seeds]
+    visited = set()
+    categorized = []
+
+    while worklist and remaining and len(categorized) < limit:
+        description, category_id = worklist.pop()
+        if description in visited:
+            continue
+        visited.add(description)
+
+        scores = process.cdist([description], [descriptions[position] for position in remaining], scorer=fuzz.WRatio,
+                               score_cutoff=score_threshold, workers=CategorizationIndex.workers)[0]
+        still_remaining = []
+
+        for position, score in zip(remaining, scores):
+            if score > score_threshold and len(categorized) < limit:
+                transaction = uncategorized[position]
+                transaction.category_id = category_id
+                categorized.append(transaction)
+                worklist.append((descriptions[position], category_id))
+            else:
+                still_remaining.append(position)
+
+        remaining = still_remaining
+
+    with atomic():
+        Transaction.objects.bulk_update(categorized, ['category'], batch_size=500)
+        MonthlyCategoryTotal.objects.add_transactions(categorized)
+    categorization_indexes.add(user_id, [(transaction.description, transaction.category_id)
+                                         for transaction in categorized])
+
+    return len(categorized)
@@ -0,0 +1,88 @@
+import csv
+import json
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+# the columns of an export, in the order of TransactionManager.for_export
+EXPORT_COLUMNS = ('date', 'payee', 'memo', 'inflow', 'outflow', 'category', 'to_account_number', 'code')
+
+
+class _Line:
+    """A file-like object of which `write` returns the line, so csv.writer formats a row without a buffer"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class ExportFormat:
+    name = None
+    label = None
+    content_type = None
+    extension = None
+
+    def header(self) -> str:
+        return ''
+
+    def line(self, row: tuple) -> str:
+        raise NotImplementedError
+
+    def lines(self, rows: Iterable[tuple]) -> Iterator[str]:
+        """
+        :param rows: the values of the transactions, as returned by TransactionManager.for_export
+        :return: the text of the export, a line at a time
+        """
+        header = self.header()
+        if header:
+            yield header
+
+        for row in rows:
+            yield self.line(row)
+
+
+class CsvExportFormat(ExportFormat):
+    name = 'csv'
+    label = 'CSV'
+    content_type = 'text/csv'
+    extension = 'csv'
+
+    def __init__(self):
+        self._writer = csv.writer(_Line())
+
+    def header(self) -> str:
+        return self._writer.writerow(EXPORT_COLUMNS)
+
+    def line(self, row: tuple) -> str:
+        # a date and a decimal are written by their str, e.g. 2020-04-01 and 12.50
+        return self._writer.writerow(row)
+
+
+class NdjsonExportFormat(ExportFormat):
+    """A json object per line, amounts are strings so they keep their exact value"""
+    name = 'ndjson'
+    label = 'NDJSON'
+    content_type = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def line(self, row: tuple) -> str:
+        values = (value if value is None or isinstance(value, str) else str(value) for value in row)
+        return json.dumps(dict(zip(EXPORT_COLUMNS, values))) + '\n'
+
+
+class ExportFormatRegistry:
+    def __init__(self):
+        self._formats = OrderedDict()
+
+    def register(self, format_class):
+        self._formats[format_class.name] = format_class()
+        return format_class
+
+    def get(self, name: str) -> ExportFormat:
+        return self._formats[name]
+
+    def choices(self):
+        return [(name, export_format.label) for name, export_format in self._formats.items()]
+
+
+export_formats = ExportFormatRegistry()
+export_formats.register(CsvExportFormat)
+export_formats.register(NdjsonExportFormat)
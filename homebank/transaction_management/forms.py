@@ -1,13 +1,46 @@
 from django import forms
 
-from homebank.transaction_management.managers import RabobankCsvRowParser
+from homebank.transaction_management.models import Category
+from homebank.transaction_management.parsers import parsers
 from homebank.utils import FileValidator, csv_content_types_allowed
 
 
 class CsvImportForm(forms.Form):
-    csv_file = forms.FileField(validators=[FileValidator(content_types=csv_content_types_allowed)])
-    parser = RabobankCsvRowParser()
+    csv_file_validator = FileValidator(content_types=csv_content_types_allowed)
+
+    csv_file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={'multiple': True}),
+        help_text='Select several exports to import them at once')
+    categorize_in_background = forms.BooleanField(
+        required=False, help_text='Store the transactions right away and categorize them in a background job')
+    preview = forms.BooleanField(
+        required=False, help_text='Only report what the import would do, nothing gets stored')
+    bank = forms.ChoiceField(
+        required=False, choices=[('', 'Detect from the file')] + parsers.choices(),
+        help_text='Format of the bank export')
 
     # overwrite a field: clean_<name>
     def clean_name(self):
         pass
+
+    def clean_csv_file(self):
+        """
+        :return: list of all uploaded files, the file field itself only keeps the last one
+        """
+        files = self.files.getlist(self.add_prefix('csv_file')) or [self.cleaned_data['csv_file']]
+
+        for file in files:
+            self.csv_file_validator(file)
+
+        return files
+
+    def get_parser(self):
+        """
+        :return: the parser of the chosen bank, or None to detect it from the file
+        """
+        bank = self.cleaned_data.get('bank')
+        return parsers.get(bank) if bank else None
+
+
+class AssignCategoryForm(forms.Form):
+    category = forms.ModelChoiceField(queryset=Category.objects.order_by('name'))
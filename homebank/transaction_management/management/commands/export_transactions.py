@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from homebank.transaction_management.exports import export_formats
+from homebank.transaction_management.models import Category, Transaction
+from homebank.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Exports the transactions of a user as csv or ndjson, a chunk of rows at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username of the owner of the transactions')
+        parser.add_argument('--format', choices=[name for name, _ in export_formats.choices()], default='csv',
+                            help='Format of the export')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='First date, inclusive, e.g. 2020-01-01')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='Last date, inclusive, e.g. 2020-12-31')
+        parser.add_argument('--category', help='Name of the category of the exported transactions')
+        parser.add_argument('--output', help='Path of the export, written to stdout when omitted')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Amount of rows read from the database at once')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size has to be positive')
+
+        category_id = None
+        if options['category']:
+            category = Category.objects.filter(name=options['category']).first()
+            if category is None:
+                raise CommandError(f"Category {options['category']} does not exist")
+            category_id = category.id
+
+        rows = Transaction.objects.for_export(user, date_from=options['date_from'], date_to=options['date_to'],
+                                              category_id=category_id)
+        export_format = export_formats.get(options['format'])
+        lines = export_format.lines(rows.iterator(chunk_size=options['chunk_size']))
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+            amount_of_lines = 0
+            for line in lines:
+                file.write(line)
+                amount_of_lines += 1
+
+        amount = amount_of_lines - 1 if export_format.header() else amount_of_lines
+        self.stdout.write(self.style.SUCCESS(f"Exported {amount} transaction(s) to {options['output']}"))
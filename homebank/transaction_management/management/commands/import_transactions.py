@@ -0,0 +1,167 @@
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from homebank.transaction_management.managers import FileParseResult
+from homebank.transaction_management.models import ImportJob, Transaction
+from homebank.transaction_management.parsers import parsers
+from homebank.users.models import User
+
+
+class ImportState:
+    """
+    The amount of committed rows per file, stored in a json file after every commit, so an import
+    that failed can resume where it stopped. A file that changed since is imported from the start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as file:
+                self.files = json.load(file)
+
+    def committed_rows(self, file_path: str) -> int:
+        state = self.files.get(os.path.abspath(file_path))
+
+        if state is None or state['size'] != os.path.getsize(file_path):
+            return 0
+
+        return state['rows']
+
+    def is_finished(self, file_path: str) -> bool:
+        state = self.files.get(os.path.abspath(file_path))
+        return bool(state) and state['size'] == os.path.getsize(file_path) and state['finished']
+
+    def update(self, file_path: str, rows: int, finished: bool = False):
+        self.files[os.path.abspath(file_path)] = {
+            'size': os.path.getsize(file_path), 'rows': rows, 'finished': finished
+        }
+
+        # written next to the state file first, so a crash never leaves a truncated state behind
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(self.files, file, indent=2)
+        os.replace(temporary_path, self.path)
+
+
+class Command(BaseCommand):
+    help = 'Imports bank exports of a user outside of the web process, e.g. to backfill years of history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Username of the owner of the transactions')
+        parser.add_argument('files', nargs='+', help='Paths of the bank exports')
+        parser.add_argument('--bank', choices=[name for name, _ in parsers.choices()],
+                            help='Format of all files, detected per file when omitted')
+        parser.add_argument('--encoding', default='latin-1', help='Encoding of the files')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Amount of rows parsed and inserted per batch')
+        parser.add_argument('--commit-interval', type=int, default=1,
+                            help='Amount of chunks written per database transaction')
+        parser.add_argument('--no-categorize', action='store_true',
+                            help='Store the transactions uncategorized and queue an import job that categorizes them')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the rows an earlier run of the same files already committed')
+        parser.add_argument('--state-file', default='.import_transactions.json',
+                            help='Where the committed rows per file are kept for --resume')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Parse the files in this many processes, all files are then written at once')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        if options['chunk_size'] < 1 or options['commit_interval'] < 1:
+            raise CommandError('--chunk-size and --commit-interval have to be positive')
+
+        try:
+            if options['workers'] > 1:
+                if options['resume']:
+                    raise CommandError('--resume can only be used with a single worker')
+
+                results = self._import_in_parallel(user, options)
+            else:
+                results = self._import_in_chunks(user, options)
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+
+        total = FileParseResult()
+        for path, result in results:
+            self.stdout.write(f'{path}: {result.amount_successful} successful, '
+                              f'{result.amount_duplicate} duplicate(s), {result.amount_faulty} failed')
+            total.amount_successful += result.amount_successful
+            total.amount_duplicate += result.amount_duplicate
+            total.amount_faulty += result.amount_faulty
+
+        if options['no_categorize'] and total.amount_successful:
+            file_names = ', '.join(os.path.basename(path) for path, _ in results)
+            job = ImportJob.objects.create(
+                user=user,
+                file_name=file_names[:ImportJob._meta.get_field('file_name').max_length],
+                amount_successful=total.amount_successful,
+                amount_duplicate=total.amount_duplicate,
+                amount_faulty=total.amount_faulty
+            )
+            self.stdout.write(f'Categorization is queued as import job {job.id}, run process_import_jobs')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total.amount_successful} transaction(s) from {len(results)} file(s)'))
+
+    def _import_in_chunks(self, user, options):
+        state = ImportState(options['state_file'])
+        if options['resume']:
+            state.load()
+
+        results = []
+        parser = parsers.get(options['bank']) if options['bank'] else None
+
+        for path in options['files']:
+            if options['resume'] and state.is_finished(path):
+                self.stdout.write(f'{path}: already imported, skipped')
+                continue
+
+            skip_rows = state.committed_rows(path) if options['resume'] else 0
+            if skip_rows:
+                self.stdout.write(f'{path}: resuming after {skip_rows:,} row(s)')
+
+            started = time.perf_counter()
+
+            def on_progress(rows: int):
+                state.update(path, rows)
+                rows_per_second = (rows - skip_rows) / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(f'{path}: {rows:,} row(s), {rows_per_second:,.0f} rows/s')
+
+            with open(path, encoding=options['encoding'], newline='') as file:
+                result = Transaction.objects.create_from_file(
+                    file, user, chunk_size=options['chunk_size'], categorize=not options['no_categorize'],
+                    parser=parser, commit_interval=options['commit_interval'], skip_rows=skip_rows,
+                    on_progress=on_progress)
+
+            state.update(path, skip_rows + result.amount_successful + result.amount_duplicate + result.amount_faulty,
+                         finished=True)
+            results.append((path, result))
+
+        return results
+
+    def _import_in_parallel(self, user, options):
+        files = []
+        for path in options['files']:
+            with open(path, encoding=options['encoding'], newline='') as file:
+                files.append((path, file.read()))
+
+        started = time.perf_counter()
+        results = Transaction.objects.create_from_files(files, user, categorize=not options['no_categorize'],
+                                                        bank=options['bank'], workers=options['workers'],
+                                                        batch_size=options['chunk_size'])
+
+        rows = sum(result.amount_successful + result.amount_duplicate + result.amount_faulty
+                   for result in results)
+        self.stdout.write(f'{rows:,} row(s), {rows / max(time.perf_counter() - started, 1e-9):,.0f} rows/s')
+
+        return list(zip(options['files'], results))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from homebank.transaction_management.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Runs queued import jobs, categorizing the transactions of deferred csv imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Stop when the queue is empty')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait for new jobs')
+
+    def handle(self, *args, **options):
+        while True:
+            job = ImportJob.objects.claim_next()
+
+            if job is None:
+                if options['once']:
+                    return
+
+                time.sleep(options['interval'])
+                continue
+
+            self._run(job)
+
+    def _run(self, job: ImportJob):
+        self.stdout.write(f'Running import job {job.id}: {job.file_name}')
+
+        try:
+            job.run()
+        except Exception as error:  # the worker keeps serving the queue, the error is stored on the job
+            self.stderr.write(f'Import job {job.id} failed: {error}')
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Import job {job.id} categorized {job.amount_categorized} transaction(s)'))
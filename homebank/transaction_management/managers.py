@@ -1,15 +1,27 @@
-import csv
-from datetime import datetime, date
-from decimal import InvalidOperation, Decimal
-from typing import List
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from itertools import chain, islice
+from multiprocessing import get_context
+from typing import Callable, List, Optional, Tuple
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Max, Min, Q, Sum
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, models
+from django.db.models import F, FilteredRelation, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.db.transaction import atomic
+from django.utils import timezone
 
-from homebank.expenses.models import MonthlyExpenseSummary
+from homebank.expenses.models import MonthlyCategoryTotal, MonthlyExpenseSummary, MonthSnapshot
 from homebank.users.models import User
-from .utils import create_unique_code
+from homebank.utils import KeysetPage, KeysetPaginator, month_range
+from .categorization import categorization_indexes, propagate_categories
+from .parsers import CsvParser, ParsedRow, RabobankCsvRowParser, parse_export, parsers, read_first_line  # noqa F401
+from .utils import SEARCH_CONFIG, create_unique_code
 
 
 class FileParseResult:
@@ -19,9 +31,111 @@ class FileParseResult:
         self.amount_faulty = 0
 
 
-class TransactionManager(models.Manager):
+class CategoryAssignmentResult:
+    def __init__(self):
+        self.amount_assigned = 0
+        self.amount_propagated = 0
+
+
+class ImportPreview(FileParseResult):
+    """What an import would do, amount_successful being the amount of new transactions"""
+
+    def __init__(self):
+        super().__init__()
+        self.amount_categorized = 0
+        self.amount_per_category = Counter()
+
+    def add(self, new_transactions):
+        self.amount_successful += len(new_transactions)
+        self.amount_per_category.update(
+            transaction.category_id for transaction in new_transactions if transaction.category_id is not None)
+        self.amount_categorized = sum(self.amount_per_category.values())
+
+    def predicted_categories(self) -> List[Tuple[object, int]]:
+        """
+        :return: list of (Category, amount of new transactions it would get), most used first
+        """
+        from .models import Category
+
+        categories = Category.objects.in_bulk(list(self.amount_per_category))
+        return [(categories[category_id], amount) for category_id, amount in self.amount_per_category.most_common()
+                if category_id in categories]
+
+
+class KnownCodes:
+    """
+    The codes of the stored transactions on the dates seen so far. A code is derived from the date,
+    so a new transaction can only be a duplicate of one on the same day.
+    """
+
+    def __init__(self, query_set):
+        self._query_set = query_set
+        self._codes = set()
+        self._loaded_dates = set()
+
+    def __contains__(self, code: str):
+        return code in self._codes
+
+    def load_dates(self, dates, batch_size: int = 500):
+        """Fetches the codes of the dates that weren't loaded yet, in a query per `batch_size` dates"""
+        new_dates = sorted({value.date() if isinstance(value, datetime) else value
+                            for value in dates} - self._loaded_dates)
+
+        for start in range(0, len(new_dates), batch_size):
+            batch = new_dates[start:start + batch_size]
+            self._codes.update(self._query_set.filter(date__in=batch).values_list('code', flat=True))
+            self._loaded_dates.update(batch)
+
+    def add(self, codes):
+        self._codes.update(codes)
+
+
+class TransactionQuerySet(models.QuerySet):
+    delete_batch_size = 500
+
+    def delete(self):
+        """Deletes the transactions and subtracts them from the monthly totals in one batch
+
+        The rollup isn't kept up to date by a post_delete receiver, which would make Django delete
+        the transactions, and update their totals, one at a time.
+        """
+        from .models import Transaction
+
+        deleted = Counter()
+
+        with atomic():
+            stored_transactions = list(self.only(*Transaction.rollup_fields))
+            pks = [transaction.pk for transaction in stored_transactions]
+
+            for start in range(0, len(pks), self.delete_batch_size):
+                _, deleted_per_model = Transaction._base_manager.filter(
+                    pk__in=pks[start:start + self.delete_batch_size]).delete()
+                deleted.update(deleted_per_model)
+
+            MonthlyCategoryTotal.objects.remove_transactions(stored_transactions)
+
+        for user_id in {transaction.user_id for transaction in stored_transactions
+                        if transaction.category_id is not None}:
+            categorization_indexes.drop(user_id)
+
+        return sum(deleted.values()), dict(deleted)
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class TransactionManager(models.Manager.from_queryset(TransactionQuerySet)):
+    search_page_size = 50
+    month_page_size = 100
+    # the columns of an export, see exports.EXPORT_COLUMNS
+    export_fields = ('date', 'payee', 'memo', 'inflow', 'outflow', 'category__name', 'to_account_number', 'code')
+
+    def get_queryset(self):
+        # the search vector is only filtered on, it doesn't have to be loaded with every transaction
+        return super(TransactionManager, self).get_queryset().defer('search_vector')
+
     def _query_set(self):
-        return super(TransactionManager, self).get_queryset()
+        return self.get_queryset()
 
     def for_user(self, user):
         return self._query_set().filter(user=user)
@@ -29,110 +143,434 @@ class TransactionManager(models.Manager):
     def for_user_expenses(self, user):
         return self.for_user(user).exclude(category__name__in=['Budget', 'Sparen'])
 
+    def for_user_month(self, user, month: date):
+        start, end = month_range(month)
+        return self.for_user(user).filter(date__gte=start, date__lt=end)
+
     def total_budget_for_month(self, month: date, user: User) -> float:
-        return \
-        self.for_user(user).filter(category__name='Budget', date__year=month.year, date__month=month.month).aggregate(
+        return self.for_user_month(user, month).filter(category__name='Budget').aggregate(
             Sum('inflow'))['inflow__sum'] or 0
 
     def total_spent_for_month(self, month: date, user: User):
         query_set = self.for_user_expenses(user)
+        start, end = month_range(month)
         result = query_set.filter(
-            date__year=month.year, date__month=month.month, category__isnull=False
+            date__gte=start, date__lt=end, category__isnull=False
         ).aggregate(
             total_outflow=Sum('outflow'), total_inflow=Sum('inflow')
         )
 
         return Decimal(result['total_inflow'] or 0) - Decimal(result['total_outflow'] or 0)
 
-    def create_from_file(self, file_stream, user) -> FileParseResult:
+    def search(self, user, text: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+               min_amount: Optional[Decimal] = None, max_amount: Optional[Decimal] = None,
+               cursor: Optional[str] = None, per_page: Optional[int] = None) -> KeysetPage:
+        """Finds the transactions of the user by the words of their payee and memo, the best matches first
+
+        On PostgreSQL it matches the search vector, which has a GIN index, and ranks the matches
+        with a payee match weighing more than a memo match. Other databases match every word with
+        `icontains`, the newest transactions first.
+
+        :param text: words a transaction has to contain
+        :param date_from: first date, inclusive
+        :param date_to: last date, inclusive
+        :param min_amount: minimal in- or outflow
+        :param max_amount: maximal in- or outflow
+        :param cursor: next_cursor of the previous page
+        :param per_page: amount of transactions per page
+        :raises ValueError: when the cursor is invalid
+        :return: KeysetPage
+        """
+        query_set = self.for_user(user).select_related('category').only(
+            'date', 'payee', 'memo', 'inflow', 'outflow', 'category__name')
+
+        if connections[self.db].vendor == 'postgresql':
+            query = SearchQuery(text, config=SEARCH_CONFIG)
+            query_set = query_set.filter(search_vector=query).annotate(
+                # double precision, so the rank survives a round trip through the cursor
+                rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        else:
+            for word in text.split():
+                query_set = query_set.filter(Q(payee__icontains=word) | Q(memo__icontains=word))
+            query_set = query_set.annotate(rank=Value(0.0, output_field=FloatField()))
+
+        if date_from is not None:
+            query_set = query_set.filter(date__gte=date_from)
+        if date_to is not None:
+            query_set = query_set.filter(date__lte=date_to)
+        if min_amount is not None or max_amount is not None:
+            query_set = query_set.annotate(amount=Coalesce('outflow', 'inflow'))
+        if min_amount is not None:
+            query_set = query_set.filter(amount__gte=min_amount)
+        if max_amount is not None:
+            query_set = query_set.filter(amount__lte=max_amount)
+
+        paginator = KeysetPaginator(query_set, ('-rank', '-id'), (float, int), per_page or self.search_page_size)
+        return paginator.page(cursor)
+
+    def month_transactions(self, user, month: date, category_id: Optional[int] = None,
+                           per_page: Optional[int] = None) -> KeysetPaginator:
+        """Pages through the transactions of the user in a month, the newest first
+
+        Only the columns of the list are loaded. The pages are keyed on (date, id), which the index on
+        (user, category, date) serves for a single category.
+
+        :param month: any date within the month
+        :param category_id: only the transactions of this category
+        :param per_page: amount of transactions per page
+        :return: KeysetPaginator
+        """
+        query_set = self.for_user_month(user, month).only('date', 'payee', 'memo', 'inflow', 'outflow')
+
+        if category_id is not None:
+            query_set = query_set.filter(category_id=category_id)
+
+        return KeysetPaginator(query_set, ('-date', '-id'), (date.fromisoformat, int),
+                               per_page or self.month_page_size)
+
+    def for_export(self, user, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   category_id: Optional[int] = None):
+        """The values of the transactions of the user, the oldest first
+
+        The rows are tuples instead of models, iterate them with `iterator(chunk_size)` to keep an
+        export of any size in constant memory.
+
+        :param date_from: first date, inclusive
+        :param date_to: last date, inclusive
+        :param category_id: only the transactions of this category
+        :return: QuerySet of tuples in the order of `export_fields`
+        """
+        query_set = self.for_user(user)
+
+        if date_from is not None:
+            query_set = query_set.filter(date__gte=date_from)
+        if date_to is not None:
+            query_set = query_set.filter(date__lte=date_to)
+        if category_id is not None:
+            query_set = query_set.filter(category_id=category_id)
+
+        return query_set.order_by('date', 'id').values_list(*self.export_fields)
+
+    def create_from_file(self, file_stream, user, chunk_size: int = 500, categorize: bool = True,
+                         parser: Optional[CsvParser] = None, commit_interval: int = 1, skip_rows: int = 0,
+                         on_progress: Optional[Callable[[int], None]] = None,
+                         known_codes: Optional[KnownCodes] = None) -> FileParseResult:
+        """Imports all rows of a bank export, `chunk_size` rows at a time
+
+        Duplicates are looked up in memory, in the codes of all transactions on the dates of the
+        file, which are fetched once per date. The new transactions of a chunk are written with
+        one `bulk_create`, `commit_interval` chunks share a database transaction.
+
+        :param file_stream: text stream of the csv file
+        :param user: User that owns the imported transactions
+        :param chunk_size: amount of rows parsed and inserted per batch
+        :param categorize: match the new transactions with categorized ones, disable to defer it to an ImportJob
+        :param parser: parser of the bank format, detected from the first line when omitted
+        :param commit_interval: amount of chunks written per database transaction
+        :param skip_rows: amount of rows to skip, e.g. the rows committed by an earlier run that failed
+        :param on_progress: called after every commit with the amount of rows of the file that are committed
+        :param known_codes: codes of the stored transactions, shared by the imports of several files
+        :raises ValidationError: when the format of the file isn't recognized
+        :return: FileParseResult
+        """
         result = FileParseResult()
-        parser = RabobankCsvRowParser()
-        csv_reader = csv.reader(file_stream, delimiter=',', quotechar='"')
-        next(csv_reader)  # skip header
+        pending_chunks = []
+
+        def commit():
+            new_transactions = list(chain.from_iterable(pending_chunks))
+            pending_chunks.clear()
+
+            with atomic():
+                self.bulk_create(new_transactions)
+                MonthlyCategoryTotal.objects.add_transactions(new_transactions)
+            categorization_indexes.add(user.id, [(transaction.description, transaction.category_id)
+                                                 for transaction in new_transactions if transaction.category_id])
 
-        for row in csv_reader:
-            self._process_row(row, result, parser, user)
+            result.amount_successful += len(new_transactions)
+            if on_progress is not None:
+                on_progress(skip_rows + result.amount_successful + result.amount_duplicate + result.amount_faulty)
+
+        for new_transactions in self._new_transactions_per_chunk(file_stream, user, chunk_size, categorize, parser,
+                                                                 result, skip_rows, known_codes):
+            pending_chunks.append(new_transactions)
+
+            if len(pending_chunks) >= commit_interval:
+                commit()
+
+        if pending_chunks:
+            commit()
 
         return result
 
-    def _process_row(self, row, result, parser, user):
-        try:
-            transaction = parser.parse(row)
-            transaction.user = user
-            transaction.full_clean()
-            transaction.save()
-            result.amount_successful += 1
-        except ValidationError as error:
-            if 'code' in error.message_dict:
+    def create_from_files(self, files: List[Tuple[str, str]], user, categorize: bool = True, bank: Optional[str] = None,
+                          workers: Optional[int] = None, batch_size: int = 500) -> List[FileParseResult]:
+        """Imports several bank exports at once, parsing them concurrently in a pool of processes
+
+        The fingerprints of all files are merged before the duplicate check, so a transaction that
+        is in more than one export, e.g. a transfer between two own accounts, is stored only once.
+
+        :param files: list of (file name, text of the export), the name only appears in error messages
+        :param user: User that owns the imported transactions
+        :param categorize: match the new transactions with categorized ones, disable to defer it to an ImportJob
+        :param bank: name of the parser of all files, detected per file when omitted
+        :param workers: maximum amount of processes, defaults to the amount of CPUs
+        :param batch_size: amount of transactions per bulk insert
+        :raises ValidationError: when the format of a file isn't recognized
+        :return: FileParseResult per file, in the order of `files`
+        """
+        results = [FileParseResult() for _ in files]
+        names = [name for name, _ in files]
+        contents = [content for _, content in files]
+        banks = [bank] * len(files)
+
+        if len(files) > 1 and workers != 1:
+            # spawned workers don't inherit the open database connections of this process
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                exports = list(pool.map(parse_export, names, contents, banks))
+        else:
+            exports = list(map(parse_export, names, contents, banks))
+
+        new_transactions = []
+        file_of_transaction = []
+        seen_codes = set()
+
+        for export, result in zip(exports, results):
+            result.amount_faulty += export.amount_faulty
+
+            for row, code in zip(export.rows, export.codes):
+                if code in seen_codes:
+                    result.amount_duplicate += 1
+                    continue
+
+                transaction = self._to_transaction(row, user)
+                if transaction is None:
+                    result.amount_faulty += 1
+                    continue
+
+                seen_codes.add(code)
+                new_transactions.append(transaction)
+                file_of_transaction.append(result)
+
+        known_codes = KnownCodes(self._query_set())
+        known_codes.load_dates(transaction.date for transaction in new_transactions)
+
+        for result, transaction in zip(file_of_transaction, new_transactions):
+            if transaction.code in known_codes:
                 result.amount_duplicate += 1
             else:
+                result.amount_successful += 1
+        new_transactions = [transaction for transaction in new_transactions if transaction.code not in known_codes]
+
+        if categorize:
+            category_ids = categorization_indexes.get(user.id).match_many(
+                [transaction.description for transaction in new_transactions], self.model.score_threshold)
+            for transaction, category_id in zip(new_transactions, category_ids):
+                transaction.category_id = category_id
+
+        for start in range(0, len(new_transactions), batch_size):
+            batch = new_transactions[start:start + batch_size]
+
+            with atomic():
+                self.bulk_create(batch)
+                MonthlyCategoryTotal.objects.add_transactions(batch)
+            categorization_indexes.add(user.id, [(transaction.description, transaction.category_id)
+                                                 for transaction in batch if transaction.category_id])
+
+        return results
+
+    def assign_category(self, query_set, category) -> CategoryAssignmentResult:
+        """Gives a category to many transactions at once, e.g. a selection in the admin
+
+        The selection is stored with one `bulk_update`, after which the category spreads to the
+        similar uncategorized transactions in a single propagation per user, seeded with the whole
+        selection, instead of a propagation per saved transaction.
+
+        :param query_set: the transactions to categorize
+        :param category: Category to assign
+        :return: CategoryAssignmentResult
+        """
+        result = CategoryAssignmentResult()
+        changed = list(query_set.exclude(category=category).only('payee', 'memo', *self.model.rollup_fields))
+        stored_versions = [copy(transaction) for transaction in changed]
+
+        for transaction in changed:
+            transaction.category = category
+
+        with atomic():
+            self.bulk_update(changed, ['category'], batch_size=500)
+            MonthlyCategoryTotal.objects.remove_transactions(stored_versions)
+            MonthlyCategoryTotal.objects.add_transactions(changed)
+
+        result.amount_assigned = len(changed)
+        seeds_per_user = defaultdict(list)
+        recategorized_users = set()
+
+        for transaction, stored_transaction in zip(changed, stored_versions):
+            seeds_per_user[transaction.user_id].append((transaction.description, category.id))
+            if stored_transaction.category_id is not None:
+                recategorized_users.add(transaction.user_id)
+
+        for user_id, seeds in seeds_per_user.items():
+            # a description that moved to another category can't be updated in place
+            if user_id in recategorized_users:
+                categorization_indexes.drop(user_id)
+            else:
+                categorization_indexes.add(user_id, seeds)
+
+            result.amount_propagated += propagate_categories(user_id, seeds, self.model.score_threshold)
+
+        return result
+
+    def preview_file(self, file_stream, user, chunk_size: int = 500, parser: Optional[CsvParser] = None):
+        """Runs an import of a bank export without writing anything to the database
+
+        Rows are parsed, fingerprinted, checked for duplicates and categorized chunk by chunk like
+        `create_from_file` does, so memory stays bounded by the chunk size and the codes of the file.
+
+        :param file_stream: text stream of the csv file
+        :param user: User the transactions would be imported for
+        :param chunk_size: amount of rows parsed per batch
+        :param parser: parser of the bank format, detected from the first line when omitted
+        :raises ValidationError: when the format of the file isn't recognized
+        :return: ImportPreview
+        """
+        preview = ImportPreview()
+
+        for new_transactions in self._new_transactions_per_chunk(file_stream, user, chunk_size, True, parser,
+                                                                 preview):
+            preview.add(new_transactions)
+
+        return preview
+
+    def _new_transactions_per_chunk(self, file_stream, user, chunk_size, categorize, parser, result, skip_rows=0,
+                                    known_codes=None):
+        """Yields the new transactions of every chunk, the faulty rows and duplicates are counted on the result"""
+        first_line = read_first_line(file_stream)
+
+        if not first_line:
+            return
+
+        parser = parser or parsers.detect(first_line)
+        lines = file_stream if parser.has_header else chain([first_line], file_stream)
+        if known_codes is None:
+            known_codes = KnownCodes(self._query_set())
+        csv_reader = parser.reader(lines)
+        # exhausts the skipped rows without keeping them
+        deque(islice(csv_reader, skip_rows), maxlen=0)
+
+        for rows in self._read_chunks(csv_reader, chunk_size):
+            yield self._new_transactions(rows, result, parser, user, categorize, known_codes)
+
+    def _read_chunks(self, csv_reader, chunk_size: int):
+        """Lazily reads the csv rows of the stream, so only a single chunk is kept in memory"""
+        return iter(lambda: list(islice(csv_reader, chunk_size)), [])
+
+    def _new_transactions(self, rows, result, parser, user, categorize, known_codes):
+        transactions_by_code = {}
+
+        for row in parser.parse_chunk(rows):
+            transaction = self._to_transaction(row, user)
+
+            if transaction is None:
                 result.amount_faulty += 1
-        except (InvalidOperation, IndexError, ValueError):
-            result.amount_faulty += 1
+                continue
 
+            if transaction.code in transactions_by_code:
+                result.amount_duplicate += 1
+                continue
 
-class CategoryManager(models.Manager):
-    def overview_for_month(self, month: date, user: User) -> List[MonthlyExpenseSummary]:
-        month_subquery = Q(transactions__date__year=month.year,
-                           transactions__date__month=month.month, transactions__user__id=user.id)
-        total_subquery = Q(transactions__user__id=user.id)
-
-        query_set = super(CategoryManager, self).get_queryset()
-
-        query_result = query_set.exclude(
-            name='Budget'
-        ).annotate(
-            sum_outflow=Sum("transactions__outflow", filter=month_subquery),
-            sum_inflow=Sum("transactions__inflow", filter=month_subquery),
-            min_date=Min("transactions__date", filter=total_subquery),
-            max_date=Max("transactions__date", filter=total_subquery),
-            total_outflow=Sum("transactions__outflow", filter=total_subquery),
-            total_inflow=Sum("transactions__inflow", filter=total_subquery)
-        )
+            transactions_by_code[transaction.code] = transaction
 
-        return [MonthlyExpenseSummary(month, category) for category in query_result]
+        known_codes.load_dates(transaction.date for transaction in transactions_by_code.values())
+        new_transactions = [transaction for code, transaction in transactions_by_code.items()
+                            if code not in known_codes]
 
+        if categorize:
+            category_ids = categorization_indexes.get(user.id).match_many(
+                [transaction.description for transaction in new_transactions], self.model.score_threshold)
+            for transaction, category_id in zip(new_transactions, category_ids):
+                transaction.category_id = category_id
 
-class RabobankCsvRowParser:
-    to_account_number_index = 0
-    date_index = 4
-    amount_index = 6
-    payee_index = 9
-    memo_index = 19
-    automatic_incasso_id_index = 16
-    positive_amount_character = '+'
-
-    def parse(self, row: list):
-        from homebank.transaction_management.models import Transaction
-
-        amount_str = self._get_amount_str(row)
-        is_positive_amount = amount_str[0] == self.positive_amount_character
-        amount = Decimal(amount_str[1:])
-        transaction = Transaction(
-            to_account_number=row[self.to_account_number_index],
-            date=datetime.strptime(row[self.date_index], '%Y-%m-%d'),
-            payee=row[self.payee_index],
-            memo=self._parse_memo_text_from(row),
-            inflow=self._parse_inflow_from(amount, is_positive_amount),
-            outflow=self._parse_outflow_from(amount, is_positive_amount),
-        )
+        known_codes.add(transactions_by_code)
+        result.amount_duplicate += len(transactions_by_code) - len(new_transactions)
+
+        return new_transactions
 
+    def _to_transaction(self, row: Optional[ParsedRow], user):
+        if row is None:
+            return None
+
+        transaction = self.model(user=user, **row._asdict())
         transaction.code = create_unique_code(transaction)
+
+        try:
+            transaction.full_clean(exclude=['user'], validate_unique=False)
+        except ValidationError:
+            return None
+
         return transaction
 
-    def _get_amount_str(self, row):
-        return row[self.amount_index].replace(',', '.')
 
-    def _parse_memo_text_from(self, row) -> str:
-        memo = row[self.memo_index]
-        incasso_id = row[self.automatic_incasso_id_index]
-        incasso_text = '' if not incasso_id.strip(
-        ) else f" (Incasso: {incasso_id})"
+class ImportJobManager(models.Manager):
+    def claim_next(self):
+        """Marks the oldest queued job as running, skipping jobs claimed by other workers
+
+        A job that has been running for longer than settings.IMPORT_JOB_TIMEOUT seconds is claimed
+        again, its worker was most likely killed. Running a job twice is harmless, it only
+        categorizes the transactions that are still uncategorized.
+
+        :return: ImportJob or None when the queue is empty
+        """
+        stale_before = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+
+        with atomic():
+            job = self.get_queryset().select_for_update(skip_locked=True).filter(
+                Q(status=self.model.STATUS_QUEUED) | Q(status=self.model.STATUS_RUNNING, started_at__lt=stale_before)
+            ).order_by('created_at').first()
 
-        return f"{memo}{incasso_text}"
+            if job is None:
+                return None
 
-    def _parse_inflow_from(self, amount, is_positive_amount):
-        return amount if is_positive_amount else None
+            job.status = self.model.STATUS_RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
 
-    def _parse_outflow_from(self, amount, is_positive_amount):
-        return amount if not is_positive_amount else None
+        return job
+
+
+class CategoryManager(models.Manager):
+    def overview_for_month(self, month: date, user: User) -> List[MonthlyExpenseSummary]:
+        query_result = self._with_totals_of_month(month, user).exclude(name='Budget')
+
+        return [MonthlyExpenseSummary(month, category) for category in query_result]
+
+    def snapshot_for_month(self, month: date, user: User, lifetime: bool = True) -> MonthSnapshot:
+        """Gets the overview, income, spent and savings of a month in a single query
+
+        :param lifetime: include the totals over all months the averages of the summaries are based on
+        """
+        query_result = self._with_totals_of_month(month, user, lifetime)
+
+        return MonthSnapshot(month, [MonthlyExpenseSummary(month, category) for category in query_result])
+
+    def _with_totals_of_month(self, month: date, user: User, lifetime: bool = True):
+        start, _ = month_range(month)
+
+        # both relations hold at most one row per category for the user, so they are joined without aggregating
+        query_set = super(CategoryManager, self).get_queryset().annotate(
+            month_total=FilteredRelation(
+                'monthly_totals', condition=Q(monthly_totals__user=user, monthly_totals__month=start)),
+            sum_outflow=F('month_total__outflow'),
+            sum_inflow=F('month_total__inflow')
+        )
+
+        if not lifetime:
+            return query_set
+
+        return query_set.annotate(
+            lifetime_total=FilteredRelation('lifetime_totals', condition=Q(lifetime_totals__user=user)),
+            min_date=F('lifetime_total__first_date'),
+            max_date=F('lifetime_total__last_date'),
+            total_outflow=F('lifetime_total__outflow'),
+            total_inflow=F('lifetime_total__inflow')
+        )
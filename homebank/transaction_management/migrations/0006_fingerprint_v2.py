@@ -0,0 +1,20 @@
+# Generated by Django 3.0.5 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+from homebank.transaction_management.migrations.utils import recompute_codes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_management', '0005_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='transaction_date_idx'),
+        ),
+        migrations.RunPython(recompute_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.5 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+from homebank.transaction_management.migrations.utils import create_trigram_indexes, drop_trigram_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_management', '0006_fingerprint_v2'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(category__isnull=True), fields=['-id'], name='transaction_no_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('category__isnull', True), ('outflow__isnull', True)), fields=['-id'], name='transaction_no_cat_inflow_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('category__isnull', True), ('inflow__isnull', True)), fields=['-id'], name='transaction_no_cat_outflow_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
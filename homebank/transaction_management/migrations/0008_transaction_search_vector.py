@@ -0,0 +1,22 @@
+# Generated by Django 3.0.5 on 2026-10-18 07:27
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from homebank.transaction_management.migrations.utils import create_search_vector_trigger, drop_search_vector_trigger
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_management', '0007_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector_trigger, drop_search_vector_trigger),
+    ]
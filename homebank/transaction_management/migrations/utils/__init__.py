@@ -1 +1,4 @@
-from .seed_categories import *
\ No newline at end of file
+from .seed_categories import *
+from .recompute_codes import *
+from .trigram_indexes import *
+from .search_vector import *
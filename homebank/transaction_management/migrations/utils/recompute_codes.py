@@ -0,0 +1,45 @@
+import logging
+
+from homebank.transaction_management.utils import FINGERPRINT_PREFIX, create_unique_code
+
+logger = logging.getLogger(__name__)
+
+
+def recompute_codes(apps, schema_editor, batch_size=500):
+    """
+    Replaces the codes of older fingerprint versions, one batch of transactions at a time.
+
+    The older versions hashed how a date or amount happened to be represented, so an imported row
+    and a manually entered copy could get different codes that are equal in the new version. The
+    copy keeps its old code and is logged, so it can be merged by hand instead of failing the
+    unique constraint.
+    """
+    Transaction = apps.get_model('transaction_management', 'Transaction')
+    outdated = Transaction.objects.exclude(code__startswith=FINGERPRINT_PREFIX).order_by('pk')
+    last_pk = 0
+
+    while True:
+        transactions = list(outdated.filter(pk__gt=last_pk).only(
+            'code', 'date', 'to_account_number', 'inflow', 'outflow', 'payee', 'memo')[:batch_size])
+
+        if not transactions:
+            return
+
+        codes = {transaction.pk: create_unique_code(transaction) for transaction in transactions}
+        taken_codes = set(Transaction.objects.filter(code__in=codes.values()).values_list('code', flat=True))
+        recomputed = []
+
+        for transaction in transactions:
+            code = codes[transaction.pk]
+
+            if code in taken_codes:
+                logger.warning('Transaction %s keeps its code %s, it is a duplicate of the transaction with code %s',
+                               transaction.pk, transaction.code, code)
+                continue
+
+            transaction.code = code
+            taken_codes.add(code)
+            recomputed.append(transaction)
+
+        Transaction.objects.bulk_update(recomputed, ['code'])
+        last_pk = transactions[-1].pk
@@ -0,0 +1,48 @@
+from homebank.transaction_management.utils import SEARCH_CONFIG
+
+SEARCH_INDEX = 'transaction_search_vector_idx'
+SEARCH_FUNCTION = 'transaction_search_vector_update'
+SEARCH_TRIGGER = 'transaction_search_vector_trigger'
+
+
+def _search_vector(prefix: str) -> str:
+    return (f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({prefix}payee, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({prefix}memo, '')), 'B')")
+
+
+def create_search_vector_trigger(apps, schema_editor):
+    """
+    Fills the search vector of every transaction on PostgreSQL and keeps it up to date with a
+    trigger, which also covers the bulk inserts of an import
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Transaction = apps.get_model('transaction_management', 'Transaction')
+    table = schema_editor.quote_name(Transaction._meta.db_table)
+
+    schema_editor.execute(f"""
+        CREATE OR REPLACE FUNCTION {SEARCH_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {_search_vector('NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    schema_editor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TRIGGER} ON {table}')
+    schema_editor.execute(f'CREATE TRIGGER {SEARCH_TRIGGER} BEFORE INSERT OR UPDATE OF payee, memo ON {table} '
+                          f'FOR EACH ROW EXECUTE PROCEDURE {SEARCH_FUNCTION}()')
+    schema_editor.execute(f'UPDATE {table} SET search_vector = {_search_vector("")}')
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON {table} USING gin (search_vector)')
+
+
+def drop_search_vector_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Transaction = apps.get_model('transaction_management', 'Transaction')
+    table = schema_editor.quote_name(Transaction._meta.db_table)
+
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+    schema_editor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TRIGGER} ON {table}')
+    schema_editor.execute(f'DROP FUNCTION IF EXISTS {SEARCH_FUNCTION}()')
@@ -0,0 +1,27 @@
+# indexes of the admin search, which filters with `UPPER(column) LIKE UPPER('%term%')`
+TRIGRAM_INDEXES = {
+    'transaction_payee_trgm_idx': 'payee',
+    'transaction_memo_trgm_idx': 'memo',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Creates trigram indexes on PostgreSQL, so a search on a substring doesn't scan the whole table"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    Transaction = apps.get_model('transaction_management', 'Transaction')
+    table = schema_editor.quote_name(Transaction._meta.db_table)
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} '
+                              f'ON {table} USING gin (UPPER({schema_editor.quote_name(column)}) gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
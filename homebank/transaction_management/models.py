@@ -1,9 +1,18 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
-from rapidfuzz import process, fuzz
+from django.db.models import Q
+from django.db.transaction import atomic
+from django.utils import timezone
 
 # Create your models here.
-from homebank.transaction_management.managers import TransactionManager, CategoryManager
+from homebank.expenses.models import MonthlyCategoryTotal
+from homebank.transaction_management.categorization import (
+    categorization_indexes,
+    categorize_uncategorized,
+    propagate_categories
+)
+from homebank.transaction_management.managers import TransactionManager, CategoryManager, ImportJobManager
 from homebank.users.models import User
 
 
@@ -21,6 +30,9 @@ class Category(models.Model):
 
 class Transaction(models.Model):
     score_threshold = 90
+    # fields the monthly totals are derived from
+    rollup_fields = ('user', 'category', 'date', 'inflow', 'outflow')
+    rollup_attributes = ('user_id', 'category_id', 'date', 'inflow', 'outflow')
     objects = TransactionManager()
 
     code = models.CharField(unique=True, max_length=50, editable=False)
@@ -33,6 +45,8 @@ class Transaction(models.Model):
     category = models.ForeignKey(
         Category, models.SET_NULL, blank=True, null=True, related_name="transactions")
     user = models.ForeignKey(User, models.CASCADE, related_name='transactions')
+    # payee and memo, kept up to date by a trigger on PostgreSQL, see migrations.utils.search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
 
     @property
     def description(self):
@@ -40,6 +54,20 @@ class Transaction(models.Model):
 
     class Meta:
         ordering: ["date"]
+        indexes = [
+            models.Index(fields=['date'], name='transaction_date_idx'),
+            models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='transaction_user_cat_date_idx'),
+            models.Index(fields=['user', 'date'], name='transaction_uncategorized_idx',
+                         condition=Q(category__isnull=True)),
+            # the lookups of CategoryAssignFilter, in the default order of the admin changelist
+            models.Index(fields=['-id'], name='transaction_no_category_idx',
+                         condition=Q(category__isnull=True)),
+            models.Index(fields=['-id'], name='transaction_no_cat_inflow_idx',
+                         condition=Q(category__isnull=True, outflow__isnull=True)),
+            models.Index(fields=['-id'], name='transaction_no_cat_outflow_idx',
+                         condition=Q(category__isnull=True, inflow__isnull=True)),
+        ]
 
     def clean(self):
         self._validate_either_inflow_or_outflow()
@@ -54,38 +82,131 @@ class Transaction(models.Model):
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
         self._try_assign_category(self)
-        super(Transaction, self).save(force_insert, force_update, using, update_fields)
+
+        with atomic():
+            stored_transaction = self._get_stored_version()
+            super(Transaction, self).save(force_insert, force_update, using, update_fields)
+            self._update_monthly_totals(stored_transaction)
+
+        self._update_categorization_index(stored_transaction)
         self._try_assign_others_with_category()
 
+    def delete(self, using=None, keep_parents=False):
+        # subtracts the transaction from the monthly totals, see TransactionQuerySet.delete
+        deleted = Transaction.objects.filter(pk=self.pk).delete()
+        self.pk = None
+
+        return deleted
+
+    def _get_stored_version(self):
+        if self.pk is None:
+            return None
+
+        return Transaction.objects.filter(pk=self.pk).only(*self.rollup_fields).first()
+
     def _try_assign_category(self, transaction_to_assign) -> bool:
         if transaction_to_assign.category is not None or transaction_to_assign.pk:
             return
 
-        transactions = Transaction.objects.for_user(self.user).filter(category__isnull=False)
+        category_id = categorization_indexes.get(self.user_id).match(transaction_to_assign.description,
+                                                                     self.score_threshold)
 
-        transactions_by_description = dict([(t.description, t) for t in transactions])
-
-        transaction_best_match = process.extractOne(transaction_to_assign.description, transactions_by_description,
-                                                    score_cutoff=self.score_threshold)
-
-        if transaction_best_match:
-            transaction_to_assign.category = transaction_best_match[0].category
+        if category_id is not None:
+            transaction_to_assign.category_id = category_id
             return True
 
         return False
 
+    def _update_categorization_index(self, stored_transaction):
+        previous_category_id = stored_transaction.category_id if stored_transaction else None
+
+        if self.category_id == previous_category_id:
+            return
+
+        if previous_category_id is None:
+            categorization_indexes.add(self.user_id, [(self.description, self.category_id)])
+        else:
+            categorization_indexes.drop(self.user_id)
+
+    def _update_monthly_totals(self, stored_transaction):
+        if stored_transaction and all(getattr(stored_transaction, field) == getattr(self, field)
+                                      for field in self.rollup_attributes):
+            return
+
+        if stored_transaction:
+            MonthlyCategoryTotal.objects.remove_transactions([stored_transaction])
+
+        MonthlyCategoryTotal.objects.add_transactions([self])
+
     def _try_assign_others_with_category(self):
         if self.category is None:
             return
 
-        transactions = Transaction.objects.for_user(self.user).filter(category__isnull=True)
+        propagate_categories(self.user_id, [(self.description, self.category_id)], self.score_threshold)
+
+    def __str__(self):
+        return f'{self.payee} - {self.memo} ({self.id})'
+
+
+class ImportJob(models.Model):
+    """Categorization of freshly imported transactions, deferred to a worker process"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_FINISHED = 'finished'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FINISHED, 'Finished'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    objects = ImportJobManager()
+
+    user = models.ForeignKey(User, models.CASCADE, related_name='import_jobs')
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    amount_successful = models.PositiveIntegerField(default=0)
+    amount_duplicate = models.PositiveIntegerField(default=0)
+    amount_faulty = models.PositiveIntegerField(default=0)
+    amount_categorized = models.PositiveIntegerField(default=0)
+    amount_processed = models.PositiveIntegerField(default=0)
+    amount_to_process = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
 
-        for transaction in transactions:
-            result = fuzz.WRatio(transaction.description, self.description, score_cutoff=self.score_threshold)
+    class Meta:
+        ordering = ['-created_at']
 
-            if result > self.score_threshold:
-                transaction.category = self.category
-                transaction.save()
+    @property
+    def progress(self) -> int:
+        if self.status == self.STATUS_FINISHED:
+            return 100
+
+        if not self.amount_to_process:
+            return 0
+
+        return int(self.amount_processed / self.amount_to_process * 100)
+
+    def run(self):
+        try:
+            self.amount_categorized = categorize_uncategorized(
+                self.user_id, Transaction.score_threshold, on_progress=self._update_progress)
+            self.status = self.STATUS_FINISHED
+        except Exception as error:
+            self.status = self.STATUS_FAILED
+            self.error = str(error)
+            raise
+        finally:
+            self.finished_at = timezone.now()
+            self.save(update_fields=['status', 'amount_categorized', 'error', 'finished_at'])
+
+    def _update_progress(self, processed: int, total: int):
+        self.amount_processed = processed
+        self.amount_to_process = total
+        self.save(update_fields=['amount_processed', 'amount_to_process'])
 
     def __str__(self):
-        return f'{self.payee} - {self.memo} ({self.id})'
+        return f'{self.file_name} ({self.status})'
@@ -0,0 +1,254 @@
+import csv
+import re
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from io import StringIO
+from itertools import chain
+from typing import Iterable, List, Optional
+
+from django.core.exceptions import ValidationError
+
+from .utils import create_unique_code
+
+ParsedRow = namedtuple('ParsedRow', ['to_account_number', 'date', 'payee', 'memo', 'inflow', 'outflow'])
+# a whole bank export parsed by parse_export, codes holds the fingerprint of every row
+ParsedExport = namedtuple('ParsedExport', ['name', 'bank', 'rows', 'codes', 'amount_faulty'])
+
+# an optional sign, digits with optional thousands dots and an optional decimal comma, e.g. '+1.868,12'
+AMOUNT_PATTERN = re.compile(r'^\s*([+-]?)\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?\s*$')
+
+
+def read_first_line(stream) -> str:
+    """Reads the first line of an export without the byte order mark some banks start it with"""
+    return stream.readline().lstrip('\ufeff')
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str, date_format: str) -> date:
+    """Parses a date, a bank export repeats the same few dates for many rows"""
+    return datetime.strptime(value, date_format).date()
+
+
+def parse_amount(value: str) -> Decimal:
+    """Parses a Dutch formatted amount, e.g. '-1.234,50'"""
+    match = AMOUNT_PATTERN.match(value)
+
+    if match is None:
+        raise ValueError(f'Invalid amount: {value}')
+
+    sign, integer, fraction = match.groups()
+    return Decimal(f"{sign}{integer.replace('.', '')}.{fraction or '0'}")
+
+
+class CsvParser:
+    """
+    Turns the rows of a bank export into ParsedRows. Subclasses define the columns by index,
+    and the header columns the format is recognized by.
+    """
+    name = ''
+    label = ''
+    delimiter = ','
+    has_header = True
+    # {column index: header name} the first line of the export has to contain
+    header_columns = {}
+    date_format = '%Y-%m-%d'
+
+    def matches(self, first_line: str) -> bool:
+        header = self.split_line(first_line)
+
+        return all(index < len(header) and header[index].strip() == name
+                   for index, name in self.header_columns.items())
+
+    def split_line(self, line: str) -> List[str]:
+        return next(self.reader([line.lstrip('\ufeff')]), [])
+
+    def reader(self, lines: Iterable[str]):
+        return csv.reader(lines, delimiter=self.delimiter, quotechar='"')
+
+    def parse_chunk(self, rows: List[list]) -> List[Optional[ParsedRow]]:
+        """Parses a chunk of rows, None takes the place of every row that can't be parsed"""
+        parsed_rows = []
+        parse_row = self.parse_row
+
+        for row in rows:
+            try:
+                parsed_rows.append(parse_row(row))
+            except (IndexError, ValueError, ArithmeticError):
+                parsed_rows.append(None)
+
+        return parsed_rows
+
+    def parse_row(self, row: list) -> ParsedRow:
+        raise NotImplementedError
+
+    def parse(self, row: list):
+        """Parses a single row into an unsaved Transaction with its unique code"""
+        from homebank.transaction_management.models import Transaction
+
+        transaction = Transaction(**self.parse_row(row)._asdict())
+        transaction.code = create_unique_code(transaction)
+
+        return transaction
+
+
+class RabobankCsvParser(CsvParser):
+    name = 'rabobank'
+    label = 'Rabobank'
+    header_columns = {0: 'IBAN/BBAN', 4: 'Datum', 6: 'Bedrag'}
+    to_account_number_index = 0
+    date_index = 4
+    amount_index = 6
+    payee_index = 9
+    memo_index = 19
+    automatic_incasso_id_index = 16
+
+    def parse_row(self, row: list) -> ParsedRow:
+        amount = parse_amount(row[self.amount_index])
+        is_positive_amount = amount >= 0
+        incasso_id = row[self.automatic_incasso_id_index]
+        incasso_text = '' if not incasso_id.strip() else f" (Incasso: {incasso_id})"
+
+        return ParsedRow(
+            to_account_number=row[self.to_account_number_index],
+            date=parse_date(row[self.date_index], self.date_format),
+            payee=row[self.payee_index],
+            memo=f"{row[self.memo_index]}{incasso_text}",
+            inflow=amount if is_positive_amount else None,
+            outflow=None if is_positive_amount else -amount,
+        )
+
+
+class IngCsvParser(CsvParser):
+    name = 'ing'
+    label = 'ING'
+    header_columns = {0: 'Datum', 1: 'Naam / Omschrijving', 5: 'Af Bij', 6: 'Bedrag (EUR)'}
+    date_format = '%Y%m%d'
+    date_index = 0
+    payee_index = 1
+    to_account_number_index = 2
+    direction_index = 5
+    amount_index = 6
+    memo_index = 8
+    incoming_direction = 'Bij'
+
+    def parse_row(self, row: list) -> ParsedRow:
+        amount = parse_amount(row[self.amount_index])
+        is_incoming = row[self.direction_index] == self.incoming_direction
+
+        return ParsedRow(
+            to_account_number=row[self.to_account_number_index],
+            date=parse_date(row[self.date_index], self.date_format),
+            payee=row[self.payee_index],
+            memo=row[self.memo_index] or row[self.payee_index],
+            inflow=amount if is_incoming else None,
+            outflow=None if is_incoming else amount,
+        )
+
+
+class IngSemicolonCsvParser(IngCsvParser):
+    name = 'ing-semicolon'
+    label = 'ING (;)'
+    delimiter = ';'
+
+
+class AbnAmroTabParser(CsvParser):
+    """The tab separated export of ABN AMRO, which has no header line"""
+    name = 'abn-amro'
+    label = 'ABN AMRO'
+    delimiter = '\t'
+    has_header = False
+    date_format = '%Y%m%d'
+    amount_of_columns = 8
+    to_account_number_index = 0
+    date_index = 2
+    amount_index = 6
+    description_index = 7
+    # SEPA descriptions consist of /KEY/value pairs, e.g. '/TRTP/SEPA OVERBOEKING/IBAN/.../NAME/.../REMI/...'
+    sepa_field_pattern = re.compile(r'/(NAME|REMI)/(.*?)(?=/[A-Z]{3,4}/|$)')
+    max_length = 200
+
+    def matches(self, first_line: str) -> bool:
+        fields = self.split_line(first_line)
+
+        return (len(fields) == self.amount_of_columns and fields[self.to_account_number_index].isdigit()
+                and len(fields[self.date_index]) == 8 and fields[self.date_index].isdigit())
+
+    def parse_row(self, row: list) -> ParsedRow:
+        amount = parse_amount(row[self.amount_index])
+        description = ' '.join(row[self.description_index].split())
+        sepa_fields = dict(self.sepa_field_pattern.findall(description))
+
+        return ParsedRow(
+            to_account_number=row[self.to_account_number_index],
+            date=parse_date(row[self.date_index], self.date_format),
+            payee=sepa_fields.get('NAME', description)[:self.max_length],
+            memo=sepa_fields.get('REMI', description)[:self.max_length],
+            inflow=amount if amount >= 0 else None,
+            outflow=None if amount >= 0 else -amount,
+        )
+
+
+class ParserRegistry:
+    """The known bank export formats, in the order they are tried when detecting the format"""
+
+    def __init__(self):
+        self._parsers = OrderedDict()
+
+    def register(self, parser_class):
+        self._parsers[parser_class.name] = parser_class()
+        return parser_class
+
+    def get(self, name: str) -> CsvParser:
+        return self._parsers[name]
+
+    def choices(self):
+        return [(name, parser.label) for name, parser in self._parsers.items()]
+
+    def detect(self, first_line: str) -> CsvParser:
+        """Finds the parser of the export by its first line
+
+        :raises ValidationError: when none of the parsers recognizes the format
+        """
+        for parser in self._parsers.values():
+            if parser.matches(first_line):
+                return parser
+
+        raise ValidationError('The format of the bank export is not supported')
+
+
+parsers = ParserRegistry()
+parsers.register(RabobankCsvParser)
+parsers.register(IngCsvParser)
+parsers.register(IngSemicolonCsvParser)
+parsers.register(AbnAmroTabParser)
+
+# kept for existing imports, the Rabobank parser used to be the only one
+RabobankCsvRowParser = RabobankCsvParser
+
+
+def parse_export(name: str, content: str, bank: Optional[str] = None) -> ParsedExport:
+    """
+    Parses and fingerprints a whole bank export. It doesn't touch the database, so it can run in a
+    worker process of a pool, one export per worker.
+
+    :param name: file name of the export
+    :param content: text of the export
+    :param bank: name of the parser, detected from the first line when omitted
+    :raises ValidationError: when the format of the export isn't recognized
+    :return: ParsedExport
+    """
+    stream = StringIO(content, newline='')
+    first_line = read_first_line(stream)
+
+    if not first_line:
+        return ParsedExport(name, bank, [], [], 0)
+
+    parser = parsers.get(bank) if bank else parsers.detect(first_line)
+    lines = stream if parser.has_header else chain([first_line], stream)
+    parsed_rows = parser.parse_chunk(list(parser.reader(lines)))
+    rows = [row for row in parsed_rows if row is not None]
+
+    return ParsedExport(name, parser.name, rows, [create_unique_code(row) for row in rows],
+                        len(parsed_rows) - len(rows))
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from homebank.expenses.snapshots import month_snapshots
+from .categorization import categorization_indexes
+from .models import Category
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_month_snapshots(sender, **kwargs):
+    month_snapshots.invalidate_all()
+
+
+@receiver(post_delete, sender=Category)
+def drop_categorization_indexes(sender, **kwargs):
+    # the transactions of the category are set to NULL without signals, the indexes still refer to it
+    categorization_indexes.drop_all()
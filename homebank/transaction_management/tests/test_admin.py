@@ -1,6 +1,10 @@
 import pytest
 from django.contrib.messages import get_messages
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from homebank.transaction_management.models import ImportJob, Transaction
+from homebank.transaction_management.tests.factories import CategoryFactory, TransactionFactory
 from homebank.transaction_management.tests.utils import open_file
 
 
@@ -16,6 +20,43 @@ class TestTransactionAdmin:
         assert response.status_code == 200
         assert 'href="import-csv/"' in str(response.content)
 
+    def test_lists_transactions_with_their_category_in_constant_queries(
+            self, admin_client, admin_user, django_assert_num_queries):
+        TransactionFactory.create_batch(5, user=admin_user)
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.get('/admin/transaction_management/transaction/')
+
+        TransactionFactory.create_batch(25, user=admin_user)
+        with django_assert_num_queries(len(queries)):
+            response = admin_client.get('/admin/transaction_management/transaction/')
+
+        assert response.context['cl'].result_count == 30
+
+    @pytest.mark.parametrize('lookup', ['no_category', 'no_category_inflow', 'no_category_outflow'])
+    def test_filters_transactions_to_assign(self, admin_client, admin_user, lookup):
+        TransactionFactory(user=admin_user, category=None, inflow=10, outflow=None)
+        TransactionFactory(user=admin_user, category=None, inflow=None, outflow=10)
+        TransactionFactory(user=admin_user)
+
+        response = admin_client.get(f'/admin/transaction_management/transaction/?category_assign={lookup}')
+
+        assert response.context['cl'].result_count == (2 if lookup == 'no_category' else 1)
+
+    def test_assigns_a_category_to_the_selected_transactions(self, admin_client, admin_user):
+        category = CategoryFactory()
+        selected = TransactionFactory.create_batch(2, user=admin_user, category=None)
+        data = {'action': 'assign_category', '_selected_action': [transaction.pk for transaction in selected]}
+
+        response = admin_client.post('/admin/transaction_management/transaction/', data)
+        assert 'admin/transaction_management/assign_category.html' in (t.name for t in response.templates)
+
+        response = admin_client.post('/admin/transaction_management/transaction/',
+                                     {**data, 'category': category.pk, 'apply': 'Assign'})
+        assert response.status_code == 302
+        assert Transaction.objects.filter(category=category).count() == 2
+        assert str(list(get_messages(response.wsgi_request))[0]).startswith(
+            f'Assigned {category.name} to 2 transaction(s)')
+
     def test_shows_csv_import(self, admin_client):
         response = admin_client.get('/admin/transaction_management/transaction/import-csv/')
         assert response.status_code == 200
@@ -44,3 +85,47 @@ class TestTransactionAdmin:
         messages = list(get_messages(response.wsgi_request))
         assert len(messages) == 1
         assert str(messages[0]) == 'Import result: 1 successful, 1 duplicate(s), 2 failed'
+
+    def test_upload_several_csv_files(self, admin_client):
+        files = [open_file('./data/dummy.csv'), open_file('./data/bad-dummy.csv')]
+        response = admin_client.post('/admin/transaction_management/transaction/import-csv/',
+                                     data={'csv_file': files, 'categorize_in_background': 'on'})
+        assert response.status_code == 302
+
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        assert messages[:2] == ['Import result of dummy.csv: 3 successful, 0 duplicate(s), 0 failed',
+                                'Import result of bad-dummy.csv: 0 successful, 2 duplicate(s), 2 failed']
+
+        job = ImportJob.objects.get()
+        assert job.file_name == 'dummy.csv, bad-dummy.csv'
+        assert (job.amount_successful, job.amount_duplicate, job.amount_faulty) == (3, 2, 2)
+
+    def test_streams_several_csv_files_without_a_process_pool(self, admin_client, admin_user, monkeypatch):
+        def create_from_files(*args, **kwargs):
+            raise AssertionError('the admin imports the files one after the other')
+
+        monkeypatch.setattr(Transaction.objects, 'create_from_files', create_from_files)
+        files = [open_file('./data/dummy.csv'), open_file('./data/single_dummy.csv')]
+        response = admin_client.post('/admin/transaction_management/transaction/import-csv/',
+                                     data={'csv_file': files})
+
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        assert messages == ['Import result of dummy.csv: 3 successful, 0 duplicate(s), 0 failed',
+                            'Import result of single_dummy.csv: 0 successful, 1 duplicate(s), 0 failed']
+
+    def test_upload_csv_with_background_categorization(self, admin_client):
+        file = open_file('./data/bad-dummy.csv')
+        file_form = {'csv_file': file, 'categorize_in_background': 'on'}
+        response = admin_client.post('/admin/transaction_management/transaction/import-csv/', data=file_form)
+        assert response.status_code == 302
+
+        job = ImportJob.objects.get()
+        assert job.status == ImportJob.STATUS_QUEUED
+        assert job.file_name == 'bad-dummy.csv'
+        assert (job.amount_successful, job.amount_duplicate, job.amount_faulty) == (1, 1, 2)
+
+    def test_shows_import_jobs(self, admin_client, admin_user):
+        ImportJob.objects.create(user=admin_user, file_name='export.csv')
+        response = admin_client.get('/admin/transaction_management/importjob/')
+        assert response.status_code == 200
+        assert 'export.csv' in str(response.content)
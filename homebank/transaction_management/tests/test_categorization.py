@@ -0,0 +1,177 @@
+from datetime import date
+
+import pytest
+
+from homebank.transaction_management.categorization import (
+    categorization_indexes,
+    categorize_uncategorized,
+    propagate_categories,
+    CategorizationIndex
+)
+from homebank.expenses.models import MonthlyCategoryTotal
+from homebank.transaction_management.models import Category, Transaction
+from homebank.transaction_management.tests.utils import create_transaction
+from homebank.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user() -> User:
+    return User.objects.create_user('timo')
+
+
+@pytest.fixture
+def category() -> Category:
+    return Category.objects.create(name='Boodschappen')
+
+
+def test_index_keeps_unique_descriptions():
+    index = CategorizationIndex('version')
+    index.add('Lidl 176 Sittard Ind SITTARD - Betaalautomaat 18:10', 1)
+    index.add('lidl 176 sittard ind sittard - betaalautomaat 18:10', 2)
+
+    assert len(index) == 1
+    assert index.match('Lidl 176 Sittard Ind SITTARD - Betaalautomaat 18:10', 90) == 2
+    assert index.match('Jan Linders Sittard SITTARD', 90) is None
+
+
+def test_index_is_built_once_per_user(user, category, django_assert_num_queries):
+    create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD", memo="Betaalautomaat 18:10 pasnr. 029",
+                       category=category)
+    categorization_indexes.get(user.id)
+
+    with django_assert_num_queries(0):
+        index = categorization_indexes.get(user.id)
+
+    assert index.match("Lidl 176 Sittard Ind SITTARD - Betaalautomaat 14:14 pasnr. 008", 90) == category.id
+
+
+def test_newly_categorized_transaction_is_added_without_rebuild(user, category, django_assert_num_queries):
+    categorization_indexes.get(user.id)
+    create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD", memo="Betaalautomaat 18:10 pasnr. 029",
+                       category=category)
+
+    with django_assert_num_queries(0):
+        index = categorization_indexes.get(user.id)
+
+    assert len(index) == 1
+
+
+def test_index_is_dropped_when_category_changes(user, category):
+    other_category = Category.objects.create(name='Vrije tijd')
+    transaction = create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD",
+                                     memo="Betaalautomaat 18:10 pasnr. 029", category=category)
+    old_index = categorization_indexes.get(user.id)
+
+    transaction.category = other_category
+    transaction.save()
+    index = categorization_indexes.get(user.id)
+
+    assert index is not old_index
+    assert index.match(transaction.description, 90) == other_category.id
+
+
+def test_index_is_dropped_when_transaction_is_deleted(user, category):
+    transaction = create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD",
+                                     memo="Betaalautomaat 18:10 pasnr. 029", category=category)
+    categorization_indexes.get(user.id)
+
+    transaction.delete()
+
+    assert len(categorization_indexes.get(user.id)) == 0
+
+
+def test_indexes_are_dropped_when_category_is_deleted(user, category):
+    create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD", memo="Betaalautomaat 18:10 pasnr. 029",
+                       category=category)
+    categorization_indexes.get(user.id)
+
+    category.delete()
+    similar = create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD",
+                                 memo="Betaalautomaat 14:14 pasnr. 008")
+
+    assert similar.category is None
+    assert len(categorization_indexes.get(user.id)) == 0
+
+
+def test_matches_many_descriptions_at_once():
+    index = CategorizationIndex('version')
+    index.add('Lidl 176 Sittard Ind SITTARD - Betaalautomaat 18:10 pasnr. 029', 1)
+    index.add('Jan Linders Sittard SITTARD - Betaalautomaat 15:18 pasnr. 008', 2)
+
+    category_ids = index.match_many([
+        'Jan Linders Sittard SITTARD - Betaalautomaat 09:12 pasnr. 008',
+        'Spotify - Premium',
+        'Lidl 176 Sittard Ind SITTARD - Betaalautomaat 14:14 pasnr. 008',
+    ], 90)
+
+    assert category_ids == [2, None, 1]
+
+
+def test_categorizes_all_uncategorized_transactions_in_one_update(user, category, django_assert_num_queries):
+    create_transaction(user=user, payee="Lidl 176 Sittard Ind SITTARD", memo="Betaalautomaat 18:10 pasnr. 029",
+                       category=category)
+    similar = [
+        Transaction.objects.create(user=user, code=str(i), to_account_number='NL11RABO0101010444',
+                                   date=date(2020, 4, i + 1), payee="Lidl 176 Sittard Ind SITTARD",
+                                   memo=f"Betaalautomaat 1{i}:14 pasnr. 008", inflow=1)
+        for i in range(3)
+    ]
+    Transaction.objects.filter(pk__in=[transaction.pk for transaction in similar]).update(category=None)
+    other = create_transaction(user=user, payee="Spotify", memo="Premium")
+    categorization_indexes.get(user.id)
+
+    # uncategorized ids, one chunk of transactions, and within a savepoint a single bulk update and
+    # an update of the monthly and the lifetime total
+    with django_assert_num_queries(7):
+        amount_categorized = categorize_uncategorized(user.id, Transaction.score_threshold)
+
+    assert amount_categorized == 3
+    assert Transaction.objects.filter(category=category).count() == 4
+    assert Transaction.objects.get(pk=other.pk).category is None
+
+
+def _create_uncategorized(user, memos):
+    return [create_transaction(user=user, payee="Albert Heijn 1234 SITTARD", memo=memo) for memo in memos]
+
+
+def test_propagates_through_chains_of_similar_transactions(user, category, django_assert_num_queries):
+    direct, indirect = _create_uncategorized(user, ["Betaalautomaat 12:45 pasnr. 008", "Geldautomaat 12:45 pasnr. 029"])
+    seed = "Albert Heijn 1234 SITTARD - Betaalautomaat 10:10 pasnr. 008"
+
+    # uncategorized transactions, and within a savepoint a single bulk update and the creation of the
+    # monthly and the lifetime total, each in a nested savepoint
+    with django_assert_num_queries(12):
+        amount_categorized = propagate_categories(user.id, [(seed, category.id)], Transaction.score_threshold)
+
+    assert amount_categorized == 2
+    assert Transaction.objects.get(pk=direct.pk).category == category
+    assert Transaction.objects.get(pk=indirect.pk).category == category
+
+
+def test_propagation_is_capped(user, category, settings):
+    settings.CATEGORY_PROPAGATION_LIMIT = 1
+    _create_uncategorized(user, ["Betaalautomaat 12:45 pasnr. 008", "Betaalautomaat 12:45 pasnr. 029"])
+
+    create_transaction(user=user, payee="Albert Heijn 1234 SITTARD", memo="Betaalautomaat 10:10 pasnr. 008",
+                       category=category)
+
+    assert Transaction.objects.filter(user=user, category=category).count() == 2
+
+
+def test_assigns_a_category_to_a_selection_and_propagates_it_once(user, category):
+    selected = _create_uncategorized(user, ["Betaalautomaat 12:45 pasnr. 008", "Betaalautomaat 18:10 pasnr. 008"])
+    similar, = _create_uncategorized(user, ["Betaalautomaat 09:30 pasnr. 008"])
+    other_category = Category.objects.create(name='Uit eten')
+    moved = create_transaction(user=user, payee="Pizzeria Sittard", memo="Betaalautomaat 20:00 pasnr. 008",
+                               category=other_category)
+
+    result = Transaction.objects.assign_category(
+        Transaction.objects.filter(pk__in=[transaction.pk for transaction in selected] + [moved.pk]), category)
+
+    assert (result.amount_assigned, result.amount_propagated) == (3, 1)
+    assert Transaction.objects.filter(user=user, category=category).count() == 4
+    assert Transaction.objects.get(pk=similar.pk).category == category
+    assert MonthlyCategoryTotal.objects.get(user=user, category=category).count == 4
+    assert not MonthlyCategoryTotal.objects.filter(user=user, category=other_category).exists()
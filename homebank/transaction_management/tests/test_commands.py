@@ -0,0 +1,117 @@
+import json
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+
+from homebank.transaction_management.models import Transaction, Category, ImportJob
+from homebank.transaction_management.tests.factories import CategoryFactory, TransactionFactory
+from homebank.transaction_management.tests.utils import create_transaction
+from homebank.users.models import User
+
+
+@pytest.mark.django_db
+def test_import_job_categorizes_transactions_in_background():
+    user = User.objects.create_user('timo')
+    category = Category.objects.create(name='Vrije tijd')
+    create_transaction(payee="Lidl 176 Sittard Ind SITTARD", memo="Betaalautomaat 18:10 pasnr. 029", user=user,
+                       category=category)
+    Transaction.objects.bulk_create([
+        Transaction(code=str(i), date=date(2020, 4, 20), to_account_number='NL11RABO0101010444', inflow=1,
+                    user=user, payee=payee, memo=memo)
+        for i, (payee, memo) in enumerate([("Lidl 176 Sittard Ind SITTARD", "Betaalautomaat 14:14 pasnr. 008"),
+                                           ("Jan Linders Sittard SITTARD", "Betaalautomaat 14:20 pasnr. 008")])
+    ])
+    job = ImportJob.objects.create(user=user, file_name='export.csv')
+
+    call_command('process_import_jobs', once=True)
+
+    job.refresh_from_db()
+    assert job.status == ImportJob.STATUS_FINISHED
+    assert job.amount_categorized == 1
+    assert (job.amount_processed, job.amount_to_process) == (2, 2)
+    assert job.progress == 100
+    assert Transaction.objects.filter(user=user, category=category).count() == 2
+
+
+@pytest.mark.django_db
+def test_imports_transactions_command(capsys, tmp_path):
+    user = User.objects.create_user('import user')
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    call_command('import_transactions', 'import user', os.path.join(data_dir, 'dummy.csv'),
+                 os.path.join(data_dir, 'bad-dummy.csv'), chunk_size=1, state_file=str(tmp_path / 'state.json'))
+
+    output = capsys.readouterr().out
+    assert 'dummy.csv: 2 row(s)' in output
+    assert 'dummy.csv: 3 successful, 0 duplicate(s), 0 failed' in output
+    assert 'bad-dummy.csv: 0 successful, 2 duplicate(s), 2 failed' in output
+    assert Transaction.objects.filter(user=user).count() == 3
+
+
+@pytest.mark.django_db
+def test_imports_transactions_command_in_parallel(capsys):
+    user = User.objects.create_user('import user')
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    call_command('import_transactions', 'import user', os.path.join(data_dir, 'dummy.csv'),
+                 os.path.join(data_dir, 'bad-dummy.csv'), workers=2)
+
+    assert 'bad-dummy.csv: 0 successful, 2 duplicate(s), 2 failed' in capsys.readouterr().out
+    assert Transaction.objects.filter(user=user).count() == 3
+
+
+@pytest.mark.django_db
+def test_import_transactions_command_resumes_after_committed_rows(capsys, tmp_path):
+    user = User.objects.create_user('import user')
+    path = os.path.join(os.path.dirname(__file__), 'data', 'dummy.csv')
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({os.path.abspath(path): {
+        'size': os.path.getsize(path), 'rows': 2, 'finished': False}}))
+
+    call_command('import_transactions', 'import user', path, resume=True, no_categorize=True,
+                 state_file=str(state_file))
+
+    assert 'dummy.csv: resuming after 2 row(s)' in capsys.readouterr().out
+    assert Transaction.objects.filter(user=user).count() == 1
+    assert ImportJob.objects.get(user=user).amount_successful == 1
+    assert json.loads(state_file.read_text())[os.path.abspath(path)] == {
+        'size': os.path.getsize(path), 'rows': 3, 'finished': True}
+
+    call_command('import_transactions', 'import user', path, resume=True, state_file=str(state_file))
+
+    assert 'dummy.csv: already imported, skipped' in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+def test_exports_transactions_command(tmp_path, capsys):
+    user = User.objects.create_user('export user')
+    category = CategoryFactory(name='Boodschappen')
+    TransactionFactory(user=user, category=category, date=date(2020, 4, 1), payee='Albert Heijn', inflow=None,
+                       outflow=Decimal('12.50'))
+    TransactionFactory(user=user, category=category, date=date(2020, 6, 1))
+    TransactionFactory(user=user, date=date(2020, 4, 2))
+    output = tmp_path / 'export.csv'
+
+    call_command('export_transactions', 'export user', date_from=date(2020, 4, 1), date_to=date(2020, 4, 30),
+                 category='Boodschappen', output=str(output))
+
+    lines = output.read_text().splitlines()
+    assert 'Exported 1 transaction(s)' in capsys.readouterr().out
+    assert lines[0] == 'date,payee,memo,inflow,outflow,category,to_account_number,code'
+    assert lines[1].startswith('2020-04-01,Albert Heijn,')
+    assert ',,12.50,Boodschappen,' in lines[1]
+
+
+@pytest.mark.django_db
+def test_exports_transactions_command_as_ndjson(capsys):
+    user = User.objects.create_user('export user')
+    TransactionFactory.create_batch(2, user=user)
+
+    call_command('export_transactions', 'export user', format='ndjson')
+
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(rows) == 2
+    assert set(rows[0]) == {'date', 'payee', 'memo', 'inflow', 'outflow', 'category', 'to_account_number', 'code'}
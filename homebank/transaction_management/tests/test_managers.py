@@ -1,11 +1,17 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from io import StringIO
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from homebank.transaction_management.managers import RabobankCsvRowParser
-from homebank.transaction_management.models import Transaction
-from homebank.transaction_management.tests.factories import TransactionFactory
+from homebank.transaction_management.managers import KnownCodes
+from homebank.transaction_management.parsers import RabobankCsvRowParser
+from homebank.transaction_management.models import ImportJob, Transaction
+from homebank.transaction_management.tests.factories import CategoryFactory, TransactionFactory
+from homebank.transaction_management.tests.utils import open_file
 from homebank.users.models import User
 from homebank.users.tests.factories import UserFactory
 
@@ -40,6 +46,248 @@ class TestTransactionManager:
         total_spent = Transaction.objects.total_spent_for_month(date, user)
         assert total_spent == Decimal((1 * 50) - (10 * 50))
 
+    def test_imports_file_in_chunks(self, django_assert_num_queries):
+        user = UserFactory()
+
+        # categorized descriptions + codes stored on the only date of the file + (a bulk insert within
+        # a savepoint) per chunk of 2 rows
+        with django_assert_num_queries(1 + 1 + 2 * 3), open_file('./data/dummy.csv') as file:
+            result = Transaction.objects.create_from_file(file, user, chunk_size=2)
+
+        assert result.amount_successful == 3
+        assert result.amount_duplicate == 0
+        assert result.amount_faulty == 0
+        assert Transaction.objects.for_user(user).count() == 3
+
+    def test_commits_several_chunks_at_once(self, django_assert_num_queries):
+        user = UserFactory()
+        progress = []
+
+        # categorized descriptions + codes stored on the only date of the file + (a bulk insert within
+        # a savepoint) per commit of 2 chunks
+        with django_assert_num_queries(1 + 1 + 2 * 3), open_file('./data/dummy.csv') as file:
+            result = Transaction.objects.create_from_file(file, user, chunk_size=1, commit_interval=2,
+                                                          on_progress=progress.append)
+
+        assert result.amount_successful == 3
+        assert progress == [2, 3]
+
+    def test_skips_rows_of_an_earlier_import(self):
+        user = UserFactory()
+
+        with open_file('./data/dummy.csv') as file:
+            result = Transaction.objects.create_from_file(file, user, skip_rows=2)
+
+        assert (result.amount_successful, result.amount_duplicate, result.amount_faulty) == (1, 0, 0)
+        assert Transaction.objects.for_user(user).get().payee == 'SPY*Parking Atrium B.V Heerlen'
+
+    def test_counts_duplicates_within_and_across_imports(self):
+        user = UserFactory()
+
+        with open_file('./data/bad-dummy.csv') as file:
+            first_result = Transaction.objects.create_from_file(file, user, chunk_size=1)
+
+        with open_file('./data/dummy.csv') as file:
+            second_result = Transaction.objects.create_from_file(file, user)
+
+        assert (first_result.amount_successful, first_result.amount_duplicate, first_result.amount_faulty) == (1, 1, 2)
+        assert (second_result.amount_successful, second_result.amount_duplicate,
+                second_result.amount_faulty) == (2, 1, 0)
+        assert Transaction.objects.for_user(user).count() == 3
+
+    def test_detects_a_headerless_export_with_a_byte_order_mark_as_a_duplicate(self):
+        user = UserFactory()
+        line = ('123456789\tEUR\t20200401\t20200401\t100,00\t87,66\t-12,34\t'
+                '/TRTP/SEPA OVERBOEKING/IBAN/NL11RABO0104955555/BIC/RABONL2U/NAME/J. Jansen/REMI/Huur april\r\n')
+
+        Transaction.objects.create_from_file(StringIO('\ufeff' + line, newline=''), user)
+        result = Transaction.objects.create_from_file(StringIO(line, newline=''), user)
+
+        assert result.amount_duplicate == 1
+        assert Transaction.objects.for_user(user).get().to_account_number == '123456789'
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_imports_several_files_with_duplicates_across_files(self, workers):
+        user = UserFactory()
+        with open_file('./data/dummy.csv', 'rb') as file:
+            dummy = file.read().decode('latin-1')
+        with open_file('./data/bad-dummy.csv', 'rb') as file:
+            bad_dummy = file.read().decode('latin-1')
+
+        results = Transaction.objects.create_from_files(
+            [('dummy.csv', dummy), ('bad-dummy.csv', bad_dummy)], user, workers=workers, batch_size=2)
+
+        assert [(result.amount_successful, result.amount_duplicate, result.amount_faulty)
+                for result in results] == [(3, 0, 0), (0, 2, 2)]
+        assert Transaction.objects.for_user(user).count() == 3
+
+    def test_keeps_the_results_of_files_with_the_same_name_apart(self):
+        user = UserFactory()
+        with open_file('./data/dummy.csv', 'rb') as file:
+            dummy = file.read().decode('latin-1')
+        with open_file('./data/single_dummy.csv', 'rb') as file:
+            single_dummy = file.read().decode('latin-1')
+
+        results = Transaction.objects.create_from_files(
+            [('2019/export.csv', dummy), ('2020/export.csv', single_dummy)], user)
+
+        assert [(result.amount_successful, result.amount_duplicate) for result in results] == [(3, 0), (0, 1)]
+
+    def test_import_of_several_files_skips_stored_transactions(self):
+        user = UserFactory()
+        with open_file('./data/single_dummy.csv') as file:
+            Transaction.objects.create_from_file(file, user)
+        with open_file('./data/dummy.csv', 'rb') as file:
+            dummy = file.read().decode('latin-1')
+
+        [result] = Transaction.objects.create_from_files([('dummy.csv', dummy)], user)
+
+        assert (result.amount_successful, result.amount_duplicate) == (2, 1)
+        assert Transaction.objects.for_user(user).count() == 3
+
+    def test_previews_import_without_writing(self):
+        user = UserFactory()
+        category = CategoryFactory()
+        TransactionFactory(user=user, category=category, payee='SPY*Parking Atrium B.V Heerlen',
+                           memo='Betaalautomaat 19:14 pasnr. 008')
+        with open_file('./data/single_dummy.csv') as file:
+            Transaction.objects.create_from_file(file, user)
+        amount_stored = Transaction.objects.count()
+
+        with CaptureQueriesContext(connection) as queries, open_file('./data/bad-dummy.csv') as file:
+            preview = Transaction.objects.preview_file(file, user)
+
+        assert all(query['sql'].lstrip().upper().startswith('SELECT') for query in queries.captured_queries)
+        assert Transaction.objects.count() == amount_stored
+        assert (preview.amount_successful, preview.amount_duplicate, preview.amount_faulty) == (0, 2, 2)
+
+        with open_file('./data/dummy.csv') as file:
+            preview = Transaction.objects.preview_file(file, user)
+
+        assert (preview.amount_successful, preview.amount_duplicate, preview.amount_faulty) == (2, 1, 0)
+        assert preview.amount_categorized == 1
+        assert preview.predicted_categories() == [(category, 1)]
+
+    def test_import_assigns_category_of_similar_transactions(self):
+        user = UserFactory()
+        category = CategoryFactory()
+        TransactionFactory(user=user, category=category, payee='SPY*Parking Atrium B.V Heerlen',
+                           memo='Betaalautomaat 19:14 pasnr. 008')
+
+        with open_file('./data/dummy.csv') as file:
+            Transaction.objects.create_from_file(file, user)
+
+        parking = Transaction.objects.for_user(user).get(code='v2:55f89878d7d6113ef11103874ed0138a')
+        spotify = Transaction.objects.for_user(user).get(code='v2:ad5e61b37cbfa28ffab8c3de43e1441c')
+        assert parking.category == category
+        assert spotify.category is None
+
+
+@pytest.mark.django_db
+class TestTransactionSearch:
+    def test_finds_transactions_containing_every_word(self):
+        user = UserFactory()
+        albert_heijn = TransactionFactory(user=user, payee='Albert Heijn 1234 SITTARD', memo='Betaalautomaat 12:45')
+        TransactionFactory(user=user, payee='Albert Heijn 1234 SITTARD', memo='Geldautomaat 12:45')
+        TransactionFactory(payee='Albert Heijn 1234 SITTARD', memo='Betaalautomaat 12:45')
+
+        assert list(Transaction.objects.search(user, 'heijn betaalautomaat')) == [albert_heijn]
+
+    def test_filters_on_date_and_amount(self):
+        user = UserFactory()
+        in_range = TransactionFactory(user=user, payee='Spotify', date=date(2020, 4, 1), inflow=None, outflow=10)
+        TransactionFactory(user=user, payee='Spotify', date=date(2020, 4, 1), inflow=None, outflow=100)
+        TransactionFactory(user=user, payee='Spotify', date=date(2020, 6, 1), inflow=None, outflow=10)
+
+        page = Transaction.objects.search(user, 'spotify', date_from=date(2020, 3, 1), date_to=date(2020, 5, 31),
+                                          min_amount=Decimal(5), max_amount=Decimal(50))
+
+        assert list(page) == [in_range]
+
+    def test_pages_through_the_results(self):
+        user = UserFactory()
+        transactions = TransactionFactory.create_batch(5, user=user, payee='Spotify')
+
+        first_page = Transaction.objects.search(user, 'spotify', per_page=3)
+        last_page = Transaction.objects.search(user, 'spotify', cursor=first_page.next_cursor, per_page=3)
+
+        assert list(first_page) + list(last_page) == sorted(transactions, key=lambda transaction: -transaction.id)
+        assert not last_page.has_next()
+
+
+@pytest.mark.django_db
+def test_pages_through_the_transactions_of_a_month_and_category():
+    user = UserFactory()
+    category = CategoryFactory()
+    transactions = [TransactionFactory(user=user, category=category, date=date(2020, 4, day)) for day in (1, 1, 2)]
+    TransactionFactory(user=user, category=category, date=date(2020, 5, 1))
+    TransactionFactory(user=user, date=date(2020, 4, 1))
+
+    paginator = Transaction.objects.month_transactions(user, date(2020, 4, 1), category_id=category.id, per_page=2)
+    first_page = paginator.page()
+    last_page = paginator.page(first_page.next_cursor)
+
+    assert list(first_page) + list(last_page) == [transactions[2], transactions[1], transactions[0]]
+    assert not last_page.has_next()
+
+
+@pytest.mark.django_db
+def test_claims_a_running_job_of_which_the_worker_stopped(settings):
+    settings.IMPORT_JOB_TIMEOUT = 600
+    user = UserFactory()
+    ImportJob.objects.create(user=user, file_name='busy.csv', status=ImportJob.STATUS_RUNNING,
+                             started_at=timezone.now() - timedelta(seconds=60))
+    abandoned = ImportJob.objects.create(user=user, file_name='abandoned.csv', status=ImportJob.STATUS_RUNNING,
+                                         started_at=timezone.now() - timedelta(seconds=3600))
+
+    assert ImportJob.objects.claim_next() == abandoned
+    assert ImportJob.objects.claim_next() is None
+
+    abandoned.refresh_from_db()
+    assert abandoned.started_at > timezone.now() - timedelta(seconds=60)
+
+
+@pytest.mark.django_db
+def test_loads_the_known_codes_in_a_query_per_batch_of_dates():
+    transaction = TransactionFactory(date=date(2020, 4, 3))
+    known_codes = KnownCodes(Transaction.objects.all())
+
+    with CaptureQueriesContext(connection) as queries:
+        known_codes.load_dates([date(2020, 4, day) for day in range(1, 6)], batch_size=2)
+        known_codes.load_dates([date(2020, 4, 1), datetime(2020, 4, 5, 12)], batch_size=2)
+
+    assert len(queries) == 3
+    assert transaction.code in known_codes
+
+
+def _explain(queryset, label: str) -> str:
+    sql, params = queryset.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # the planner prefers a sequential scan on tables this small
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        # the label keeps sqlite from reusing the cached plan of an identical statement
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {label} */', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+def test_month_queries_use_the_user_date_index():
+    queryset = Transaction.objects.for_user_month(UserFactory(), date(2020, 2, 1))
+    plan_after = _explain(queryset, 'after')
+
+    with connection.cursor() as cursor:
+        for index_name in ('transaction_user_date_idx', 'transaction_user_cat_date_idx',
+                           'transaction_uncategorized_idx'):
+            cursor.execute(f'DROP INDEX {index_name}')
+
+    plan_before = _explain(queryset, 'before')
+
+    assert 'transaction_user_date_idx' not in plan_before
+    assert 'transaction_user_date_idx' in plan_after
+
 
 @pytest.fixture
 def parser():
@@ -67,7 +315,7 @@ class TestRabobankCsvRowParser:
 
         transaction = parser.parse(csv_row)
 
-        assert '6a25f09148bead1f64212179d61f9c37' == transaction.code
+        assert 'v2:ad5e61b37cbfa28ffab8c3de43e1441c' == transaction.code
 
     def test_fails_parser_an_invalid_row(self, parser):
         csv_row = [0, 0, 0, 0, None]
@@ -1,7 +1,14 @@
+import logging
+from datetime import date
+from decimal import Decimal
+
 import pytest
+from django.apps import apps as installed_apps
 
-from homebank.transaction_management.migrations.utils import seed_categories
-from homebank.transaction_management.models import Category
+from homebank.transaction_management.migrations.utils import recompute_codes, seed_categories
+from homebank.transaction_management.models import Category, Transaction
+from homebank.transaction_management.utils import FINGERPRINT_PREFIX
+from homebank.users.tests.factories import UserFactory
 
 pytestmark = pytest.mark.django_db
 
@@ -25,3 +32,21 @@ def test_category_seed():
     category = Category.objects.get(name='Hypotheek')
     assert category is not None
     assert category.description == 'Vaste lasten voor je huis'
+
+
+def test_recompute_codes_keeps_the_old_code_of_a_duplicate(caplog):
+    user = UserFactory()
+    # an import and a manually entered copy, which the old fingerprint hashed apart
+    Transaction.objects.bulk_create([
+        Transaction(user=user, code=code, date=date(2020, 4, 1), to_account_number='NL11RABO0101010444',
+                    payee='Spotify', memo='Premium', inflow=None, outflow=Decimal('9.99'))
+        for code in ('legacy-import', 'legacy-manual')
+    ])
+
+    with caplog.at_level(logging.WARNING):
+        recompute_codes(installed_apps, None)
+
+    codes = dict(Transaction.objects.filter(user=user).values_list('code', 'payee'))
+    assert len([code for code in codes if code.startswith(FINGERPRINT_PREFIX)]) == 1
+    assert 'legacy-manual' in codes
+    assert 'legacy-manual' in caplog.text
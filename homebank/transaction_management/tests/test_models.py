@@ -103,4 +103,3 @@ def test_assigns_category_to_other_transactions():
     assert Transaction.objects.get(pk=transaction_good.id).category == category
     assert Transaction.objects.get(pk=transaction_good_2.id).category == category
     assert Transaction.objects.get(pk=transaction_bad.id).category is None
-
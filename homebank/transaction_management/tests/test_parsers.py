@@ -0,0 +1,84 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.core.exceptions import ValidationError
+
+from homebank.transaction_management.parsers import (
+    AbnAmroTabParser,
+    IngCsvParser,
+    IngSemicolonCsvParser,
+    ParsedRow,
+    RabobankCsvParser,
+    parse_amount,
+    parse_export,
+    parsers
+)
+
+RABOBANK_HEADER = ('"IBAN/BBAN","Munt","BIC","Volgnr","Datum","Rentedatum","Bedrag","Saldo na trn",'
+                   '"Tegenrekening IBAN/BBAN","Naam tegenpartij"\r\n')
+RABOBANK_ROW = ['NL11RABO0104955555', 'EUR', 'RABONL2U', '000000000000007213', '2019-09-01', '2019-09-01', '-1.002,50',
+                '+1868,12', 'NL42RABO0114164838', 'J.M.G. Kerkhoffs eo', '', '', 'RABONL2U', 'cb', '', '', '', '', '',
+                'Spotify', ' ', '', '', '', '', '']
+ING_HEADER = '"Datum","Naam / Omschrijving","Rekening","Tegenrekening","Code","Af Bij","Bedrag (EUR)",' \
+             '"Mutatiesoort","Mededelingen"\r\n'
+ING_ROW = ['20200401', 'Albert Heijn 1234', 'NL11INGB0001234567', '', 'BA', 'Af', '12,34', 'Betaalautomaat',
+           'Pasvolgnr:001 01-04-2020 12:00']
+ABN_AMRO_LINE = '123456789\tEUR\t20200401\t20200401\t100,00\t87,66\t-12,34\t' \
+                '/TRTP/SEPA OVERBOEKING/IBAN/NL11RABO0104955555/BIC/RABONL2U/NAME/J. Jansen/REMI/Huur april' \
+                '/EREF/NOTPROVIDED\r\n'
+ABN_AMRO_ROW = ABN_AMRO_LINE.rstrip('\r\n').split('\t')
+
+
+@pytest.mark.parametrize('first_line, parser_class', [
+    (RABOBANK_HEADER, RabobankCsvParser),
+    (ING_HEADER, IngCsvParser),
+    (ING_HEADER.replace(',', ';'), IngSemicolonCsvParser),
+    (ABN_AMRO_LINE, AbnAmroTabParser),
+])
+def test_detects_the_bank_from_the_first_line(first_line, parser_class):
+    assert isinstance(parsers.detect(first_line), parser_class)
+
+
+def test_rejects_unknown_formats():
+    with pytest.raises(ValidationError):
+        parsers.detect('"Date","Description","Amount"\r\n')
+
+
+@pytest.mark.parametrize('text, amount', [
+    ('+2,50', Decimal('2.50')),
+    ('-1.868,12', Decimal('-1868.12')),
+    ('12', Decimal('12')),
+])
+def test_parses_dutch_amounts(text, amount):
+    assert parse_amount(text) == amount
+
+
+def test_parses_rabobank_rows():
+    assert RabobankCsvParser().parse_row(RABOBANK_ROW) == ParsedRow(
+        'NL11RABO0104955555', date(2019, 9, 1), 'J.M.G. Kerkhoffs eo', 'Spotify', None, Decimal('1002.50'))
+
+
+def test_parses_ing_rows():
+    assert IngCsvParser().parse_row(ING_ROW) == ParsedRow(
+        'NL11INGB0001234567', date(2020, 4, 1), 'Albert Heijn 1234', 'Pasvolgnr:001 01-04-2020 12:00', None,
+        Decimal('12.34'))
+
+
+def test_strips_the_byte_order_mark_of_a_headerless_export():
+    with_bom = parse_export('abn-amro.tab', '\ufeff' + ABN_AMRO_LINE)
+    without_bom = parse_export('abn-amro.tab', ABN_AMRO_LINE)
+
+    assert with_bom.rows[0].to_account_number == '123456789'
+    assert with_bom.codes == without_bom.codes
+
+
+def test_parses_sepa_fields_of_abn_amro_rows():
+    assert AbnAmroTabParser().parse_row(ABN_AMRO_ROW) == ParsedRow(
+        '123456789', date(2020, 4, 1), 'J. Jansen', 'Huur april', None, Decimal('12.34'))
+
+
+def test_marks_rows_it_cannot_parse():
+    invalid_date = RABOBANK_ROW[:4] + ['dit is een datum'] + RABOBANK_ROW[5:]
+
+    assert RabobankCsvParser().parse_chunk([RABOBANK_ROW, invalid_date, RABOBANK_ROW[:3]])[1:] == [None, None]
@@ -0,0 +1,26 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from homebank.transaction_management.models import Transaction
+from homebank.transaction_management.utils import create_unique_code
+
+
+def _transaction(**kwargs) -> Transaction:
+    attrs = dict(date=date(2019, 9, 1), to_account_number='NL11RABO0104955555', inflow=Decimal('2.50'), outflow=None,
+                 payee='J.M.G. Kerkhoffs eo', memo='Spotify')
+    attrs.update(kwargs)
+    return Transaction(**attrs)
+
+
+def test_code_is_versioned():
+    assert create_unique_code(_transaction()) == 'v2:ad5e61b37cbfa28ffab8c3de43e1441c'
+
+
+def test_code_does_not_depend_on_representation():
+    assert create_unique_code(_transaction()) == create_unique_code(
+        _transaction(date=datetime(2019, 9, 1), inflow=Decimal('2.5')))
+
+
+def test_inflow_and_outflow_get_different_codes():
+    assert create_unique_code(_transaction()) != create_unique_code(
+        _transaction(inflow=None, outflow=Decimal('2.50')))
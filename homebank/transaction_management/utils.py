@@ -1,21 +1,44 @@
-from hashlib import md5
+from datetime import datetime
+from decimal import Decimal
+from hashlib import blake2b
+
+FINGERPRINT_VERSION = 2
+FINGERPRINT_PREFIX = f'v{FINGERPRINT_VERSION}:'
+# text search configuration of the search vector of payee and memo, payees are names that shouldn't be stemmed
+SEARCH_CONFIG = 'simple'
 
 
 def create_unique_code(transaction):
     """
     Creates a unique code based on the attributes of a transaction model
 
+    Every field is encoded canonically and length prefixed, so the code doesn't depend on how a
+    date or amount happens to be represented and an inflow never collides with an equal outflow.
+
     :param transaction: Transaction
-    :return: hash string
+    :return: hash string, prefixed with the version of the fingerprint
     """
     attrs = (
-        transaction.date,
+        _encode_date(transaction.date),
         transaction.to_account_number,
-        transaction.inflow,
-        transaction.outflow,
+        _encode_amount(transaction.inflow),
+        _encode_amount(transaction.outflow),
         transaction.payee,
         transaction.memo)
 
-    attrs_joined = '|'.join([str(attr)
-                             for attr in attrs if attr is not None])
-    return md5('|'.join(attrs_joined).encode('utf-8')).hexdigest()
+    payload = ''.join(f'{len(attr)}:{attr}' for attr in attrs).encode('utf-8')
+    return FINGERPRINT_PREFIX + blake2b(payload, digest_size=16).hexdigest()
+
+
+def _encode_date(value) -> str:
+    if isinstance(value, datetime):
+        value = value.date()
+
+    return value.isoformat()
+
+
+def _encode_amount(value) -> str:
+    if value is None:
+        return ''
+
+    return f"{Decimal(str(value)).quantize(Decimal('0.01')):f}"
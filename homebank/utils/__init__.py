@@ -1,2 +1,5 @@
 from .constants import *
+from .currency import *
+from .dates import *
 from .validators import *
+from .pagination import *
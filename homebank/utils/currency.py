@@ -0,0 +1,63 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Union
+from unicodedata import normalize
+
+from babel import Locale
+from babel.numbers import get_currency_precision, get_currency_symbol, get_decimal_symbol, get_group_symbol
+
+
+class CurrencyFormatter:
+    """
+    Formats amounts exactly like babel's `format_currency` followed by an NFKD normalization, but reads
+    the locale's currency pattern and symbols only once instead of on every call.
+
+    :param cache_size: amount of formatted values to remember, 0 disables the cache
+    """
+
+    def __init__(self, currency: str, locale: str, cache_size: Optional[int] = 1024):
+        pattern = Locale.parse(locale).currency_formats['standard']
+        symbol = get_currency_symbol(currency, locale)
+
+        self._prefixes = tuple(normalize('NFKD', prefix.replace('¤', symbol)) for prefix in pattern.prefix)
+        self._suffixes = tuple(normalize('NFKD', suffix.replace('¤', symbol)) for suffix in pattern.suffix)
+        self._min_integer_digits = pattern.int_prec[0]
+        self._primary_group, self._secondary_group = pattern.grouping
+        self._group_symbol = normalize('NFKD', get_group_symbol(locale))
+        self._decimal_symbol = normalize('NFKD', get_decimal_symbol(locale))
+        self._digits = get_currency_precision(currency)
+        self._quantum = Decimal(1).scaleb(-self._digits)
+        self._format_value = lru_cache(cache_size)(self._format) if cache_size else self._format
+
+    def format(self, value: Union[Decimal, int, float, str]) -> str:
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+
+        # -0 equals 0 but keeps its minus sign, so the sign is part of the cache key
+        return self._format_value(value, value.is_signed())
+
+    def _format(self, value: Decimal, is_negative: bool) -> str:
+        integer, _, fraction = f'{abs(value).normalize().quantize(self._quantum):f}'.partition('.')
+        integer = integer.rjust(self._min_integer_digits, '0')
+
+        groups = []
+        group_size = self._primary_group
+        while len(integer) > group_size:
+            groups.append(integer[-group_size:])
+            integer = integer[:-group_size]
+            group_size = self._secondary_group
+        groups.append(integer)
+
+        number = self._group_symbol.join(reversed(groups))
+        if self._digits:
+            number += self._decimal_symbol + fraction
+
+        return self._prefixes[is_negative] + number + self._suffixes[is_negative]
+
+
+euro_formatter = CurrencyFormatter('EUR', 'nl_NL')
+
+
+def format_euro(value: Union[Decimal, int, float, str]) -> str:
+    """Formats the value as euros the Dutch way, e.g. '€ -1.234,50'"""
+    return euro_formatter.format(value)
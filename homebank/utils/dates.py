@@ -0,0 +1,16 @@
+from datetime import date
+from typing import Tuple
+
+from dateutil.relativedelta import relativedelta
+
+
+def month_range(month: date) -> Tuple[date, date]:
+    """
+    Gives the first day of the month and the first day of the next month, to filter with
+    `date__gte` and `date__lt` so the database can use an index on the date column
+
+    :param month: any date or datetime within the month
+    :return: (start, end) where end is exclusive
+    """
+    start = date(month.year, month.month, 1)
+    return start, start + relativedelta(months=1)
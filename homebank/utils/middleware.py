@@ -0,0 +1,142 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """The queries, database time and template render time of a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self._template_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Wraps the execution of every query, see `connection.execute_wrapper`"""
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def start_template(self):
+        self._template_started = time.perf_counter()
+
+    def stop_template(self, _response=None):
+        if self._template_started is not None:
+            self.template_seconds += time.perf_counter() - self._template_started
+            self._template_started = None
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total_seconds: float) -> str:
+        """:return: value of the Server-Timing header, durations in milliseconds"""
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ])
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures the queries, database time, template render time and total time of a sample of the
+    requests, and reports them in a `Server-Timing` header and a log line per url name.
+
+    The share of measured requests is set by REQUEST_METRICS_SAMPLE_RATE, between 0 and 1. Only
+    templates rendered by a TemplateResponse are timed separately, a view that renders a template
+    itself counts it as its own time. Place it near the top of MIDDLEWARE, so the time of the other
+    middleware is included and the template is timed right before it's rendered.
+
+    A streaming response runs most of its queries while it's sent, after the view returned. Its
+    metrics are logged once the stream is exhausted and it gets no `Server-Timing` header, as the
+    headers are sent before the queries are run.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._is_sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        request.metrics = metrics
+
+        with self._execute_wrappers(metrics):
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self._measure_stream(
+                request, response, response.streaming_content, metrics)
+            return response
+
+        total_seconds = metrics.total_seconds
+        response['Server-Timing'] = metrics.server_timing(total_seconds)
+        self._log(request, response, metrics, total_seconds)
+
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'metrics', None)
+
+        if metrics is not None:
+            metrics.start_template()
+            response.add_post_render_callback(metrics.stop_template)
+
+        return response
+
+    def _execute_wrappers(self, metrics: RequestMetrics) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def _measure_stream(self, request, response, content, metrics: RequestMetrics):
+        """Yields the content of a streaming response, counting the queries run to produce each chunk"""
+        chunks = iter(content)
+        exhausted = object()
+
+        # installed per chunk, so the wrappers don't outlive a stream of which the client went away
+        try:
+            while True:
+                with self._execute_wrappers(metrics):
+                    chunk = next(chunks, exhausted)
+
+                if chunk is exhausted:
+                    return
+
+                yield chunk
+        finally:
+            self._log(request, response, metrics, metrics.total_seconds)
+
+    def _is_sampled(self) -> bool:
+        sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0)
+        return sample_rate >= 1 or (sample_rate > 0 and random.random() < sample_rate)
+
+    def _log(self, request, response, metrics: RequestMetrics, total_seconds: float):
+        resolver_match = getattr(request, 'resolver_match', None)
+        record = {
+            'url_name': resolver_match.view_name if resolver_match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_seconds * 1000, 1),
+            'template_ms': round(metrics.template_seconds * 1000, 1),
+            'total_ms': round(total_seconds * 1000, 1),
+            'streamed': response.streaming,
+        }
+
+        logger.info(' '.join(f'{key}={value}' for key, value in record.items()), extra={'metrics': record})
@@ -0,0 +1,155 @@
+from typing import Any, Callable, Optional, Tuple
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginates a large table without counting all of its rows. On PostgreSQL the count of an
+    unfiltered queryset is taken from the statistics of the planner, which are refreshed by
+    (auto)vacuum, instead of a `COUNT(*)` that scans the whole table. Filtered querysets and small
+    tables are counted exactly.
+    """
+    # below this amount of rows a count is cheap and an estimate isn't worth its inaccuracy
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self._estimated_count()
+
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+
+        return estimate
+
+    def _estimated_count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where or query.is_sliced or query.distinct:
+            return None
+
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(query.model._meta.db_table)])
+            row = cursor.fetchone()
+
+        # a table that was never analyzed has no (or a negative) estimate
+        return int(row[0]) if row and row[0] > 0 else None
+
+
+class KeysetPage:
+    def __init__(self, object_list: list, next_cursor: Optional[str]):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetStream:
+    """
+    A page of which the rows are fetched lazily, a chunk at a time, so a page of thousands of rows
+    can be rendered while it's read. The next cursor is known once all rows are iterated.
+    """
+
+    def __init__(self, paginator: 'KeysetPaginator', queryset, chunk_size: int):
+        self.paginator = paginator
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.next_cursor = None
+
+    def __iter__(self):
+        last_row = None
+
+        for position, row in enumerate(self.queryset[:self.paginator.per_page + 1].iterator(self.chunk_size)):
+            if position == self.paginator.per_page:
+                self.next_cursor = self.paginator._encode(last_row)
+                return
+
+            last_row = row
+            yield row
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginates by the values of the last row of the previous page, `WHERE (date, id) < (...)`,
+    instead of an OFFSET that makes the database read and skip every row before the page.
+
+    :param queryset: the rows, annotated with every field of the ordering
+    :param ordering: a unique ordering, e.g. ('-date', '-id')
+    :param converters: per field of the ordering the function that parses it from a cursor,
+        e.g. (date.fromisoformat, int)
+    :param per_page: maximum amount of rows of a page
+    """
+    separator = ','
+
+    def __init__(self, queryset, ordering: Tuple[str, ...], converters: Tuple[Callable[[str], Any], ...],
+                 per_page: int):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.converters = converters
+        self.per_page = per_page
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """
+        :param cursor: next_cursor of the previous page, the first page when omitted
+        :raises ValueError: when the cursor can't be parsed
+        :return: KeysetPage
+        """
+        rows = list(self._after_cursor(cursor)[:self.per_page + 1])
+        next_cursor = self._encode(rows[self.per_page - 1]) if len(rows) > self.per_page else None
+
+        return KeysetPage(rows[:self.per_page], next_cursor)
+
+    def stream(self, cursor: Optional[str] = None, chunk_size: int = 500) -> KeysetStream:
+        """
+        :param cursor: next_cursor of the previous page, the first page when omitted
+        :param chunk_size: amount of rows fetched from the database cursor at once
+        :raises ValueError: when the cursor can't be parsed
+        :return: KeysetStream
+        """
+        return KeysetStream(self, self._after_cursor(cursor), chunk_size)
+
+    def _after_cursor(self, cursor: Optional[str]):
+        if not cursor:
+            return self.queryset
+
+        return self.queryset.filter(self._after(self._decode(cursor)))
+
+    def _after(self, values: list) -> Q:
+        """(a, b) after (x, y) is: a after x, or a equal to x and b after y"""
+        condition = None
+
+        for position in reversed(range(len(self.ordering))):
+            field = self.ordering[position].lstrip('-')
+            lookup = 'lt' if self.ordering[position].startswith('-') else 'gt'
+            after = Q(**{f'{field}__{lookup}': values[position]})
+            condition = after if condition is None else after | (Q(**{field: values[position]}) & condition)
+
+        return condition
+
+    def _encode(self, row) -> str:
+        # str of a date is its iso format, of a float the shortest text that parses back to the same float
+        return self.separator.join(str(getattr(row, field.lstrip('-'))) for field in self.ordering)
+
+    def _decode(self, cursor: str) -> list:
+        values = cursor.split(self.separator)
+        if len(values) != len(self.converters):
+            raise ValueError(f'Invalid cursor: {cursor}')
+
+        return [convert(value) for convert, value in zip(self.converters, values)]
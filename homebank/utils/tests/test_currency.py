@@ -0,0 +1,32 @@
+from decimal import Decimal
+from unicodedata import normalize
+
+from babel.numbers import format_currency
+from hypothesis import example, given, strategies
+
+from homebank.utils.currency import CurrencyFormatter, format_euro
+
+
+def _babel_euro(value) -> str:
+    return normalize('NFKD', format_currency(value, 'EUR', locale='nl_NL'))
+
+
+@given(strategies.decimals(min_value=-10 ** 12, max_value=10 ** 12, places=4, allow_nan=False, allow_infinity=False))
+@example(Decimal('-0'))
+@example(Decimal('-0.001'))
+@example(Decimal('0.005'))
+@example(Decimal('0.015'))
+def test_formats_like_babel(value: Decimal):
+    assert format_euro(value) == _babel_euro(value)
+
+
+@given(strategies.integers(min_value=-10 ** 9, max_value=10 ** 9))
+def test_formats_integers_like_babel(value: int):
+    assert format_euro(value) == _babel_euro(value)
+
+
+def test_keeps_the_sign_of_negative_zero_apart_in_the_cache():
+    formatter = CurrencyFormatter('EUR', 'nl_NL')
+
+    assert formatter.format(Decimal('0')) == '€ 0,00'
+    assert formatter.format(Decimal('-0')) == '€ -0,00'
@@ -0,0 +1,85 @@
+import logging
+
+import pytest
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from homebank.transaction_management.tests.factories import TransactionFactory
+from homebank.users.models import User
+from homebank.utils.middleware import RequestMetricsMiddleware
+
+
+def count_users(request):
+    User.objects.count()
+    User.objects.exists()
+    return TemplateResponse(request, engines['django'].from_string('{{ title }}'), {'title': 'users'})
+
+
+@pytest.mark.django_db
+def test_measures_queries_and_template_of_a_request(settings, request_factory):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1
+
+    # renders the template response after the view like the request handler does
+    def get_response(request):
+        return middleware.process_template_response(request, count_users(request)).render()
+
+    middleware = RequestMetricsMiddleware(get_response)
+    response = middleware(request_factory.get('/users/'))
+
+    assert response.content == b'users'
+    assert response['Server-Timing'].startswith('db;dur=')
+    assert 'desc="2 queries"' in response['Server-Timing']
+    assert 'tpl;dur=' in response['Server-Timing'] and 'total;dur=' in response['Server-Timing']
+
+
+def test_skips_requests_outside_of_the_sample(settings, request_factory):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 0
+    middleware = RequestMetricsMiddleware(lambda request: HttpResponse())
+
+    request = request_factory.get('/')
+    response = middleware(request)
+
+    assert not response.has_header('Server-Timing')
+    assert not hasattr(request, 'metrics')
+
+
+@pytest.mark.django_db
+def test_logs_metrics_per_url_name(settings, client, user, caplog):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1
+    client.force_login(user)
+
+    with caplog.at_level(logging.INFO, logger='homebank.utils.middleware'):
+        response = client.get('/expenses/2020-04/')
+
+    record = caplog.records[-1].metrics
+    assert response.has_header('Server-Timing')
+    assert record['url_name'] == 'expenses:month'
+    assert record['status'] == 200
+    assert record['queries'] > 0
+    assert record['template_ms'] > 0
+    assert record['total_ms'] >= record['db_ms']
+
+
+@pytest.mark.django_db
+def test_logs_the_queries_of_a_streaming_response_when_it_is_sent(settings, client, user, caplog):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1
+    TransactionFactory.create_batch(3, user=user)
+    client.force_login(user)
+
+    with caplog.at_level(logging.INFO, logger='homebank.utils.middleware'):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('expenses:export'))
+            assert not caplog.records
+
+            content = b''.join(response.streaming_content)
+
+    record = caplog.records[-1].metrics
+    assert len(content.splitlines()) == 4
+    assert not response.has_header('Server-Timing')
+    assert record['url_name'] == 'expenses:export'
+    assert record['streamed'] is True
+    assert record['queries'] == len(queries)
@@ -0,0 +1,65 @@
+import pytest
+
+from homebank.users.models import User
+from homebank.users.tests.factories import UserFactory
+from homebank.utils import EstimatedCountPaginator, KeysetPaginator
+
+pytestmark = pytest.mark.django_db
+
+
+def test_counts_exactly_without_an_estimate(django_assert_num_queries):
+    UserFactory.create_batch(3)
+    paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 2)
+
+    with django_assert_num_queries(1):
+        assert paginator.count == 3
+    assert paginator.num_pages == 2
+
+
+def test_uses_the_estimate_of_a_large_table(monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(EstimatedCountPaginator, '_estimated_count', lambda self: 250000)
+    paginator = EstimatedCountPaginator(User.objects.order_by('pk'), 100)
+
+    with django_assert_num_queries(0):
+        assert paginator.count == 250000
+    assert paginator.num_pages == 2500
+
+
+def test_counts_a_small_table_exactly(monkeypatch):
+    monkeypatch.setattr(EstimatedCountPaginator, '_estimated_count', lambda self: 40)
+    UserFactory.create_batch(2)
+
+    assert EstimatedCountPaginator(User.objects.order_by('pk'), 100).count == 2
+
+
+def test_pages_through_rows_by_their_last_values():
+    users = [UserFactory(is_staff=index % 2 == 0) for index in range(5)]
+    paginator = KeysetPaginator(User.objects.all(), ('-is_staff', 'id'), (lambda value: value == 'True', int), 2)
+
+    first_page = paginator.page()
+    second_page = paginator.page(first_page.next_cursor)
+    last_page = paginator.page(second_page.next_cursor)
+
+    expected = sorted(users, key=lambda user: (not user.is_staff, user.id))
+    assert list(first_page) + list(second_page) + list(last_page) == expected
+    assert not last_page.has_next()
+
+
+def test_streams_a_page_in_chunks():
+    users = sorted(UserFactory.create_batch(5), key=lambda user: -user.id)
+    paginator = KeysetPaginator(User.objects.all(), ('-id',), (int,), 3)
+
+    first_page = paginator.stream(chunk_size=2)
+    first_rows = list(first_page)
+    last_page = paginator.stream(first_page.next_cursor, chunk_size=2)
+
+    assert first_rows == users[:3]
+    assert list(last_page) == users[3:]
+    assert not last_page.has_next()
+
+
+def test_rejects_an_invalid_cursor():
+    paginator = KeysetPaginator(User.objects.all(), ('-id',), (int,), 2)
+
+    with pytest.raises(ValueError):
+        paginator.page('a,b')
@@ -0,0 +1,35 @@
+from io import BytesIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from homebank.utils import FileValidator, csv_content_types_allowed
+
+
+class ReadRecorder(BytesIO):
+    def __init__(self, content: bytes):
+        super().__init__(content)
+        self.read_sizes = []
+
+    def read(self, size=-1):
+        self.read_sizes.append(size)
+        return super().read(size)
+
+
+def test_sniffs_content_type_from_a_bounded_prefix():
+    validator = FileValidator(content_types=csv_content_types_allowed)
+    data = ReadRecorder(b'"IBAN/BBAN","Munt","BIC"\n' + b'"NL11RABO0104955555","EUR","RABONL2U"\n' * 100000)
+
+    validator(data)
+
+    assert data.read_sizes == [FileValidator.sniff_size]
+    assert data.tell() == 0
+
+
+def test_rejects_unsupported_content_type():
+    validator = FileValidator(content_types=csv_content_types_allowed)
+    png_header = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00'
+
+    with pytest.raises(ValidationError):
+        validator(SimpleUploadedFile('image.csv', png_header))
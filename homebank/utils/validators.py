@@ -14,6 +14,8 @@ class FileValidator(object):
                      "Your file size is %(size)s."),
         'content_type': "Files of type %(content_type)s are not supported.",
     }
+    # libmagic only inspects the start of a file, there's no need to read the whole upload
+    sniff_size = 2048
 
     def __init__(self, max_size=None, min_size=None, content_types=()):
         self.max_size = max_size
@@ -38,7 +40,7 @@ class FileValidator(object):
                                   'min_size', params)
 
         if self.content_types:
-            content_type = magic.from_buffer(data.read(), mime=True)
+            content_type = magic.from_buffer(data.read(self.sniff_size), mime=True)
             data.seek(0)
 
             if content_type not in self.content_types: